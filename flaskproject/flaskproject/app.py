@@ -1,15 +1,34 @@
 import os
-from flask import Flask, render_template, request, redirect, url_for, flash, jsonify, send_from_directory
+from flask import Flask, render_template, request, redirect, url_for, flash, jsonify, abort
 from flask_sqlalchemy import SQLAlchemy
 from flask_login import LoginManager, UserMixin, login_user, login_required, logout_user, current_user
-from werkzeug.security import generate_password_hash, check_password_hash
-from werkzeug.utils import secure_filename
-from datetime import datetime
 from dotenv import load_dotenv
 from flask_restful import Api
-from flask_jwt_extended import JWTManager
+from flask_jwt_extended import JWTManager, jwt_required, get_jwt_identity
 from models import db, User, Item,Complaint
 from flask import current_app
+import search_index
+import query_plans
+import click
+import sys
+from export import EXPORT_FORMATS, export_stream
+import bulk
+from images import image_pipeline, variant_filename, file_dhash
+import storage
+import resumable
+import matching
+import locations
+import facets
+from lost_registry import lost_items, CATEGORIES as LOST_CATEGORIES, FIELDS as LOST_FIELDS
+from autocomplete import autocomplete
+import json
+from image_index import image_index
+from file_serving import serve_upload
+from passwords import password_hasher, HasherBusy
+from view_counter import view_counter
+from cache import response_cache, ITEMS
+from types import SimpleNamespace
+from sqlalchemy.orm import joinedload
 
 from resources import (
     RegisterResource,
@@ -18,10 +37,24 @@ from resources import (
     AllComplaintsResource,
     DeleteComplaintResource,
     UpdateComplaintResource,
-    SingleComplaintResource
+    SingleComplaintResource,
+    ComplaintMatchesResource,
+    SimilarImagesResource,
+    SearchResource,
+    AutocompleteResource,
+    FacetsResource,
+    ComplaintChangesResource,
+    ExportItemsResource,
+    BulkAddComplaintsResource,
+    BulkProvisionUsersResource,
+    UploadsResource,
+    UploadResource,
+    UploadCommitResource,
+    StreamUploadResource
 )
 
 from flask_cors import CORS
+from flask_migrate import Migrate
 
 
 # Load environment variables
@@ -40,6 +73,52 @@ app.config['SQLALCHEMY_DATABASE_URI'] = os.getenv('DATABASE_URL', 'sqlite:///los
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
 app.config['JWT_SECRET_KEY'] = 'super-secret-key'
 app.config['UPLOAD_FOLDER'] = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'static/uploads')
+# Item.views is written behind: at most this many seconds (or hits) are buffered per worker
+app.config['VIEW_FLUSH_INTERVAL'] = float(os.getenv('VIEW_FLUSH_INTERVAL', 5))
+app.config['VIEW_FLUSH_THRESHOLD'] = int(os.getenv('VIEW_FLUSH_THRESHOLD', 100))
+# Response cache: entries expire after CACHE_TTL seconds even if nothing in this worker bumped them
+app.config['CACHE_MAX_ENTRIES'] = int(os.getenv('CACHE_MAX_ENTRIES', 1024))
+app.config['CACHE_TTL'] = float(os.getenv('CACHE_TTL', 30))
+# Roles allowed to read /cache/stats
+app.config['STATS_ROLES'] = ('admin',)
+# Bulk export: rows fetched per cursor batch, and the roles allowed to download dumps
+app.config['EXPORT_BATCH_SIZE'] = int(os.getenv('EXPORT_BATCH_SIZE', 1000))
+app.config['EXPORT_ROLES'] = ('admin', 'security')
+# Bulk ingest: rows per insert transaction, and the most rows accepted per request
+app.config['BULK_CHUNK_SIZE'] = int(os.getenv('BULK_CHUNK_SIZE', 500))
+app.config['BULK_MAX_ROWS'] = int(os.getenv('BULK_MAX_ROWS', 10000))
+# Image worker threads, and how many uploads may wait for them before being deferred
+app.config['IMAGE_WORKERS'] = int(os.getenv('IMAGE_WORKERS', 2))
+app.config['IMAGE_QUEUE_SIZE'] = int(os.getenv('IMAGE_QUEUE_SIZE', 256))
+# Photo similarity: default Hamming distance for /similar-images, and how often each worker
+# reloads its BK-tree to pick up photos hashed by other workers
+app.config['IMAGE_MATCH_DISTANCE'] = int(os.getenv('IMAGE_MATCH_DISTANCE', 10))
+app.config['IMAGE_INDEX_TTL'] = float(os.getenv('IMAGE_INDEX_TTL', 300))
+# Resumable uploads: largest file, largest single chunk, and how long an idle session is kept
+app.config['UPLOAD_MAX_SIZE'] = int(os.getenv('UPLOAD_MAX_SIZE', 20 * 1024 * 1024))
+app.config['UPLOAD_CHUNK_MAX'] = int(os.getenv('UPLOAD_CHUNK_MAX', 8 * 1024 * 1024))
+app.config['UPLOAD_SESSION_TTL'] = int(os.getenv('UPLOAD_SESSION_TTL', 24 * 3600))
+# Uploaded file serving: max-age for non-hashed names, and optional offload to the front server
+# ('x-sendfile' for Apache/lighttpd, 'x-accel-redirect' for nginx with an internal location at UPLOAD_ACCEL_PREFIX)
+app.config['UPLOAD_CACHE_MAX_AGE'] = int(os.getenv('UPLOAD_CACHE_MAX_AGE', 3600))
+app.config['UPLOAD_OFFLOAD'] = os.getenv('UPLOAD_OFFLOAD')
+app.config['UPLOAD_ACCEL_PREFIX'] = os.getenv('UPLOAD_ACCEL_PREFIX', '/protected-uploads/')
+# Password hashing: werkzeug method string (changing it rehashes each user at their next login),
+# hashing threads, how many hashes may queue for them, and how long a request waits before a 503
+app.config['PASSWORD_HASH_METHOD'] = os.getenv('PASSWORD_HASH_METHOD', 'pbkdf2:sha256')
+app.config['PASSWORD_WORKERS'] = int(os.getenv('PASSWORD_WORKERS', 2))
+app.config['PASSWORD_QUEUE_LIMIT'] = int(os.getenv('PASSWORD_QUEUE_LIMIT', 16))
+app.config['PASSWORD_WAIT_TIMEOUT'] = float(os.getenv('PASSWORD_WAIT_TIMEOUT', 5))
+# Bulk user provisioning: roles allowed to use /users/bulk, and hashing processes (default: one per CPU)
+app.config['PROVISION_ROLES'] = ('admin',)
+app.config['PROVISION_PROCESSES'] = int(os.getenv('PROVISION_PROCESSES', 0)) or None
+# Lost/found matching: matches kept per item, the lowest score worth keeping, and the share
+# of all items above which a term is too common to find candidates with
+app.config['MATCH_TOP_K'] = int(os.getenv('MATCH_TOP_K', 10))
+app.config['MATCH_MIN_SCORE'] = float(os.getenv('MATCH_MIN_SCORE', 1.0))
+app.config['MATCH_MAX_DF_RATIO'] = float(os.getenv('MATCH_MAX_DF_RATIO', 0.2))
+# Autocomplete: how often each worker rebuilds its prefix index to pick up other workers' writes
+app.config['AUTOCOMPLETE_TTL'] = float(os.getenv('AUTOCOMPLETE_TTL', 300))
 
 # Ensure upload directory exists
 os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
@@ -50,29 +129,200 @@ login_manager = LoginManager(app)
 login_manager.login_view = 'login'
 api = Api(app)
 jwt = JWTManager(app)
+# Schema changes go through migrations: run `flask db upgrade` after pulling
+migrate = Migrate(app, db, directory=os.path.join(app.root_path, 'migrations'), render_as_batch=True)
+view_counter.init_app(app)
+response_cache.init_app(app)
+image_pipeline.init_app(app)
+image_index.init_app(app)
+autocomplete.init_app(app)
+password_hasher.init_app(app)
 
-# Create tables
-with app.app_context():
-    db.create_all()
-
-# Dummy lost items data by category
-lost_items = {
-    "electronics": [],
-    "accessories": [],
-    "documents": [],
-    "keys": [],
-    "clothing": [],
-    "other": []
-}
 
 # API Routes
 api.add_resource(RegisterResource, '/api/register')
 api.add_resource(LoginResource, '/api/login')
 api.add_resource(AddComplaintResource, '/add-complaint')
+api.add_resource(BulkAddComplaintsResource, '/complaints/bulk')
+api.add_resource(BulkProvisionUsersResource, '/users/bulk')
 api.add_resource(AllComplaintsResource, '/all-complaints')
+api.add_resource(ComplaintChangesResource, '/all-complaints/changes')
 api.add_resource(DeleteComplaintResource, '/delete-complaint/<int:complaint_id>')
 api.add_resource(UpdateComplaintResource, '/complaints/<int:complaint_id>/update')
 api.add_resource(SingleComplaintResource, '/complaint/<int:complaint_id>')
+api.add_resource(ComplaintMatchesResource, '/complaint/<int:complaint_id>/matches')
+api.add_resource(SimilarImagesResource, '/complaint/<int:complaint_id>/similar-images')
+api.add_resource(SearchResource, '/api/search')
+api.add_resource(AutocompleteResource, '/autocomplete')
+api.add_resource(FacetsResource, '/facets')
+api.add_resource(UploadsResource, '/uploads')
+api.add_resource(UploadResource, '/uploads/<string:upload_id>')
+api.add_resource(UploadCommitResource, '/uploads/<string:upload_id>/commit')
+api.add_resource(StreamUploadResource, '/uploads/stream')
+api.add_resource(ExportItemsResource, '/export/items')
+
+
+@app.cli.command('rebuild-search-index')
+def rebuild_search_index():
+    """Rebuild the full-text search index from the item table."""
+    count = search_index.rebuild_index()
+    print(f"Indexed {count} items")
+
+
+@app.cli.command('rebuild-matches')
+def rebuild_matches():
+    """Rebuild the lost/found matching index and every item's matches."""
+    indexed, stored = matching.rebuild()
+    print(f"Indexed {indexed} items, stored {stored} matches")
+
+
+@app.cli.command('load-locations')
+@click.argument('path', type=click.Path(exists=True, dir_okay=False))
+def load_locations(path):
+    """Add the places of a nested JSON gazetteer (building > floor > room) and their aliases."""
+    with open(path, encoding='utf-8') as f:
+        created, skipped = locations.load(json.load(f))
+    db.session.commit()
+    for alias in skipped:
+        print(f"alias '{alias}' already belongs to another place, skipped")
+    print(f"Added {created} locations")
+
+
+@app.cli.command('relocate-items')
+def relocate_items():
+    """Resolve every item's free-text location against the gazetteer again."""
+    print(f"Updated the location of {locations.relocate_items()} items")
+    print("Run `flask rebuild-matches` so matching uses the new places")
+
+
+@app.cli.command('rebuild-facets')
+def rebuild_facets():
+    """Recompute the per-category/status item counters from the item table."""
+    print(f"Counted {facets.rebuild()} category/status pairs")
+
+
+@app.cli.command('process-images')
+@click.option('--all', 'process_all', is_flag=True, help='Reprocess images that already have variants.')
+def process_images(process_all):
+    """Write variants for uploaded images that don't have them yet."""
+    query = db.session.query(Item.image_filename).filter(Item.image_filename.isnot(None)).distinct()
+    if not process_all:
+        query = query.filter(db.or_(Item.image_processed.is_(False), Item.image_processed.is_(None)))
+    done = failed = 0
+    for (filename,) in query.all():
+        if image_pipeline.process(filename):
+            done += 1
+        else:
+            failed += 1
+    print(f"Processed {done} images, {failed} rejected or left for a retry")
+
+
+@app.cli.command('rehash-images')
+def rehash_images():
+    """Recompute the perceptual hash of every item photo."""
+    folder = app.config['UPLOAD_FOLDER']
+    filenames = db.session.query(Item.image_filename).filter(Item.image_filename.isnot(None)).distinct()
+    hashed = missing = 0
+    for (filename,) in filenames.all():
+        try:
+            image_hash = file_dhash(os.path.join(folder, filename))
+        except (OSError, ValueError):
+            missing += 1
+            continue
+        Item.query.filter_by(image_filename=filename).update({'image_hash': image_hash}, synchronize_session=False)
+        hashed += 1
+    db.session.commit()
+    image_index.reset()
+    print(f"Hashed {hashed} photos, {missing} missing or unreadable")
+
+
+@app.cli.command('collect-blobs')
+def collect_blobs():
+    """Delete uploaded files that no item references any more, and abandoned partial uploads."""
+    print(f"Removed {storage.collect_garbage()} unreferenced uploads")
+    print(f"Removed {resumable.purge_stale(app.config['UPLOAD_SESSION_TTL'])} abandoned upload sessions")
+
+
+@app.context_processor
+def inject_facet_counts():
+    # A function, so the counters are only read by templates that show them:
+    # facet_counts().get('electronics', {}).get('lost', 0)
+    return {'facet_counts': facets.counts}
+
+
+@app.template_global()
+def image_variant_url(item, variant='thumb', ext='jpg'):
+    # List templates use the small variant once it exists, else the original upload
+    if not item.image_filename:
+        return None
+    filename = variant_filename(item.image_filename, variant, ext) if item.image_processed else item.image_filename
+    return url_for('uploaded_file', filename=filename)
+
+
+@app.cli.command('check-query-plans')
+def check_query_plans():
+    """Print the query plan of each hot query and fail if one scans the item table."""
+    if not query_plans.report():
+        raise SystemExit(1)
+
+
+@app.cli.command('export-items')
+@click.option('--format', 'fmt', type=click.Choice(list(EXPORT_FORMATS)), default='ndjson')
+@click.option('--gzip', is_flag=True, help='Compress the output with gzip.')
+@click.option('--output', '-o', type=click.Path(dir_okay=False), help='Write to this file instead of stdout.')
+def export_items(fmt, gzip, output):
+    """Stream every item as NDJSON or CSV."""
+    out = open(output, 'wb') if output else sys.stdout.buffer
+    try:
+        for chunk in export_stream(fmt, gzip, app.config['EXPORT_BATCH_SIZE']):
+            out.write(chunk)
+    finally:
+        if output:
+            out.close()
+
+
+@app.cli.command('import-items')
+@click.argument('path', type=click.Path(exists=True, dir_okay=False))
+@click.option('--user', 'username', required=True, help='Username the imported items are reported under.')
+def import_items(path, username):
+    """Bulk-import items from a CSV or JSON file."""
+    user = User.query.filter_by(username=username).first()
+    if not user:
+        raise click.ClickException(f"Unknown user {username}")
+    content_type = 'text/csv' if path.lower().endswith('.csv') else 'application/json'
+    with open(path, 'rb') as stream:
+        results = bulk.ingest_items(bulk.read_rows(stream, content_type), user.id,
+                                    chunk_size=app.config['BULK_CHUNK_SIZE'])
+    # The workers are daemon threads: let them finish the queued photos before exiting
+    image_pipeline.join()
+    response_cache.bump(ITEMS)
+
+    summary = bulk.summarize(results)
+    for result in summary['results']:
+        if result['status'] == 'error':
+            print(f"row {result['row']}: {'; '.join(result['errors'])}")
+    print(f"Created {summary['created']} items, {summary['failed']} failed")
+
+
+@app.cli.command('provision-users')
+@click.argument('path', type=click.Path(exists=True, dir_okay=False))
+@click.option('--processes', type=int, default=None, help='Hashing processes (default: one per CPU).')
+def provision_users(path, processes):
+    """Create users from a CSV (username,email,password[,role]) or JSON file."""
+    content_type = 'text/csv' if path.lower().endswith('.csv') else 'application/json'
+    with open(path, 'rb') as stream:
+        results = bulk.provision_users(
+            bulk.read_rows(stream, content_type),
+            app.config['PASSWORD_HASH_METHOD'], app.config.get('PASSWORD_SALT_LENGTH', 16),
+            chunk_size=app.config['BULK_CHUNK_SIZE'],
+            processes=processes or app.config['PROVISION_PROCESSES']
+        )
+
+    summary = bulk.summarize(results)
+    for result in summary['results']:
+        if result['status'] != 'created':
+            print(f"row {result['row']} ({result['status']}): {'; '.join(result['errors'])}")
+    print(f"Created {summary['created']} users, {summary['failed']} failed")
 
 
 # User loader for Flask-Login
@@ -80,22 +330,44 @@ api.add_resource(SingleComplaintResource, '/complaint/<int:complaint_id>')
 def load_user(user_id):
     return User.query.get(int(user_id))
 
-@app.route('/static/<path:filename>')
-def serve_static(filename):
-    return send_from_directory('static', filename)
+def item_rows(query):
+    # Detached, attribute-compatible copies of the rows so list pages can be cached
+    rows = []
+    for item in query.options(joinedload(Item.user)).all():
+        fields = {column.name: getattr(item, column.name) for column in Item.__table__.columns}
+        rows.append(SimpleNamespace(**fields, user=SimpleNamespace(username=item.user.username if item.user else None)))
+    return rows
+
+
+@app.route('/cache/stats')
+@jwt_required()
+def cache_stats():
+    user = db.session.get(User, int(get_jwt_identity()))
+    if not user or user.role not in app.config['STATS_ROLES']:
+        return jsonify({"message": "You are not authorized to view cache statistics"}), 403
+    return jsonify(response_cache.stats())
 
 
 # Routes
 @app.route('/')
 def home():
-    items = Item.query.order_by(Item.date_posted.desc()).all()
+    items = response_cache.get_or_set(
+        ITEMS, 'home',
+        lambda: item_rows(Item.query.order_by(Item.date_posted.desc()))
+    )
     return render_template('home.html', items=items)
 
 @app.route('/login', methods=['GET', 'POST'])
 def login():
     if request.method == 'POST':
         user = User.query.filter_by(username=request.form['username']).first()
-        if user and check_password_hash(user.password_hash, request.form['password']):
+        try:
+            valid = user is not None and password_hasher.verify_and_update(user, request.form['password'])
+        except HasherBusy as exc:
+            flash(exc.message, 'error')
+            return render_template('login.html'), exc.status, {'Retry-After': str(exc.retry_after)}
+        if valid:
+            db.session.commit()
             login_user(user)
             flash('Logged in successfully.', 'success')
             return redirect(url_for('home'))
@@ -113,10 +385,16 @@ def register():
             flash('Email already registered', 'error')
             return redirect(url_for('register'))
 
+        try:
+            password_hash = password_hasher.hash(request.form['password'])
+        except HasherBusy as exc:
+            flash(exc.message, 'error')
+            return render_template('register.html'), exc.status, {'Retry-After': str(exc.retry_after)}
+
         user = User(
             username=request.form['username'],
             email=request.form['email'],
-            password_hash=generate_password_hash(request.form['password']),
+            password_hash=password_hash,
             role=request.form.get('role', 'student')
         )
         db.session.add(user)
@@ -139,9 +417,8 @@ def new_item():
         file = request.files.get('image')
         image_filename = None
         if file and allowed_file(file.filename):
-            filename = secure_filename(file.filename)
-            image_filename = f"{datetime.utcnow().strftime('%Y%m%d%H%M%S')}_{filename}"
-            file.save(os.path.join(app.config['UPLOAD_FOLDER'], image_filename))
+            # Content-addressed: identical photos are stored once
+            image_filename = storage.save_upload(file)
 
         item = Item(
             title=request.form['title'],
@@ -154,6 +431,10 @@ def new_item():
         )
         db.session.add(item)
         db.session.commit()
+        response_cache.invalidate_item(item.id)
+        # Thumbnails and WebP variants are written in the background
+        image_pipeline.submit(image_filename)
+        matching.refresh_matches(item)
         flash('Item reported successfully!', 'success')
         return redirect(url_for('home'))
     return render_template('new_item.html')
@@ -161,8 +442,8 @@ def new_item():
 @app.route('/item/<int:item_id>')
 def item_detail(item_id):
     item = Item.query.get_or_404(item_id)
-    item.views += 1
-    db.session.commit()
+    # Counted in memory and flushed in batches instead of a write per page view
+    view_counter.hit(item.id)
     return render_template('item_detail.html', item=item)
 
 @app.route('/profile')
@@ -183,6 +464,9 @@ def update_item_status(item_id):
     if new_status in ['lost', 'found', 'returned']:
         item.status = new_status
         db.session.commit()
+        response_cache.invalidate_item(item_id)
+        # A returned item drops out of matching; a lost/found switch pairs it the other way
+        matching.refresh_matches(item)
         flash(f'Item status updated to {new_status}', 'success')
     return redirect(url_for('profile'))
 
@@ -192,29 +476,44 @@ def allowed_file(filename):
 
 @app.route('/search', methods=['GET'])
 def search():
+    q = request.args.get('q', '').strip()
     category = request.args.get('category', '').strip().lower()
     status = request.args.get('status', '').strip().lower()
+    location = request.args.get('location', '').strip()
+    page = request.args.get('page', 1, type=int)
 
     # Start with base query
     items = Item.query
 
-    # Apply category filter
+    # Apply location filter (the place and everything inside it, through the gazetteer)
+    if location:
+        items = locations.filter_items(items, location)
+
+    # Apply category filter (exact match so ix_item_category_date_posted applies)
     if category:
-        items = items.filter(Item.category.ilike(f'%{category}%'))
+        items = items.filter(Item.category == category)
 
-    # Apply status filter
+    # Apply status filter (exact match so ix_item_status_date_posted applies)
     if status:
-        items = items.filter(Item.status.ilike(f'%{status}%'))
+        items = items.filter(Item.status == status)
+
+    # Full-text match over title, description and location, best match first
+    if q:
+        items = search_index.apply_search(items, q)
+    else:
+        items = items.order_by(Item.date_posted.desc())
 
     # Get final results
-    items = items.all()
+    pagination = items.paginate(page=page, per_page=app.config.get('SEARCH_PAGE_SIZE', 20), error_out=False)
 
-    return render_template('search_results.html', items=items, category=category, status=status)
+    return render_template('search_results.html', items=pagination.items, pagination=pagination,
+                           q=q, category=category, status=status, location=location)
 
 
+# The one route for uploaded files: caching headers, Range, precompressed variants, offload
 @app.route('/static/uploads/<path:filename>')
 def uploaded_file(filename):
-    return send_from_directory(app.config['UPLOAD_FOLDER'], filename)
+    return serve_upload(filename)
 
 
 @app.route('/electronics-lost', methods=['GET', 'POST'])
@@ -227,25 +526,24 @@ def electronics_lost():
         contact = request.form['contact']
         
         # Save the item details
-        lost_items.append({
-            'id': len(lost_items) + 1,  # Assign a unique ID
-            'item_name': item_name,
-            'location': location,
-            'date_lost': date_lost,
-            'description': description,
-            'contact': contact
-        })
+        lost_items.add(
+            'electronics',
+            item_name=item_name,
+            location=location,
+            date_lost=date_lost,
+            description=description,
+            contact=contact
+        )
         
         return redirect(url_for('electronics_lost'))  # Reload the page
 
-    return render_template('electronics_lost.html', lost_items=lost_items)
+    return render_template('electronics_lost.html', lost_items=lost_items.list('electronics'))
 
 
 # Route to delete an item
 @app.route('/electronics-lost/delete/<int:item_id>', methods=['POST'])
 def delete_lost_item(item_id):
-    global lost_items
-    lost_items = [item for item in lost_items if item['id'] != item_id]
+    lost_items.delete('electronics', item_id)
     flash('Item deleted successfully!', 'success')
     return redirect(url_for('electronics_lost'))
 
@@ -272,19 +570,11 @@ def delete_lost_item(item_id):
 
 def lost_item_category(category):
     if request.method == 'POST':
-        item = {
-            "id": len(lost_items[category]) + 1,  # Assign a unique ID
-            "item_name": request.form["item_name"],
-            "location": request.form["location"],
-            "date_lost": request.form["date_lost"],
-            "description": request.form["description"],
-            "contact": request.form["contact"]
-        }
-        lost_items[category].append(item)
+        lost_items.add(category, **{field: request.form[field] for field in LOST_FIELDS})
         flash(f"Lost {category.capitalize()} item reported successfully!", "success")
         return redirect(url_for(f"lost_{category}"))
     
-    return render_template("lost_item.html", category=category, items=lost_items[category])
+    return render_template("lost_item.html", category=category, items=lost_items.list(category))
 
 
 # Routes for each category
@@ -316,8 +606,9 @@ def lost_other():
 # Delete item function
 @app.route("/delete/<category>/<int:item_id>", methods=["POST"])
 def delete_item(category, item_id):
-    global lost_items
-    lost_items[category] = [item for item in lost_items[category] if item["id"] != item_id]
+    if category not in LOST_CATEGORIES:
+        abort(404)
+    lost_items.delete(category, item_id)
     flash(f"{category.capitalize()} item deleted successfully!", "success")
     return redirect(url_for(f"lost_{category}"))
 
@@ -325,17 +616,15 @@ def delete_item(category, item_id):
 # Edit item function
 @app.route("/edit/<category>/<int:item_id>", methods=["GET", "POST"])
 def edit_item(category, item_id):
-    item = next((i for i in lost_items[category] if i["id"] == item_id), None)
+    if category not in LOST_CATEGORIES:
+        abort(404)
+    item = lost_items.get(category, item_id)
     if not item:
         flash("Item not found!", "danger")
         return redirect(url_for(f"lost_{category}"))
 
     if request.method == "POST":
-        item["item_name"] = request.form["item_name"]
-        item["location"] = request.form["location"]
-        item["date_lost"] = request.form["date_lost"]
-        item["description"] = request.form["description"]
-        item["contact"] = request.form["contact"]
+        lost_items.update(category, item_id, **{field: request.form[field] for field in LOST_FIELDS})
         flash(f"{category.capitalize()} item updated successfully!", "success")
         return redirect(url_for(f"lost_{category}"))
 
@@ -384,6 +673,8 @@ def edit_db_item(item_id):
         item.title = request.form['title']
         item.description = request.form['description']
         db.session.commit()
+        response_cache.invalidate_item(item_id)
+        matching.refresh_matches(item)
         flash('Item updated successfully!', 'success')
         return redirect(url_for('electronics'))
 
@@ -402,6 +693,7 @@ def delete_report_item(item_id):
 
     db.session.delete(item)
     db.session.commit()
+    response_cache.invalidate_item(item_id)
     flash('Item deleted successfully!', 'success')
     return redirect(url_for('electronics'))
 
@@ -415,16 +707,14 @@ def report_lost_electronics():
     description = request.form["description"]
     contact = request.form["contact"]
 
-    new_item = {
-        "id": len(lost_items["electronics"]) + 1,
-        "item_name": item_name,
-        "location": location,
-        "date_lost": date_lost,
-        "description": description,
-        "contact": contact,
-    }
-
-    lost_items["electronics"].append(new_item)
+    lost_items.add(
+        "electronics",
+        item_name=item_name,
+        location=location,
+        date_lost=date_lost,
+        description=description,
+        contact=contact,
+    )
     flash("Lost electronics item reported successfully!", "success")
     return redirect(url_for("home"))
 
@@ -436,9 +726,17 @@ def report_lost_electronics():
 
 @app.route('/category/<string:category_name>')
 def category_page(category_name):
-    # Fetch items based on the category
-    items = Item.query.filter_by(category=category_name).order_by(Item.date_posted.desc()).all()
-    return render_template('category.html', category_name=category_name, items=items)
+    location = request.args.get('location', '').strip()
+
+    def build():
+        # Fetch items based on the category, optionally within one place
+        query = Item.query.filter_by(category=category_name)
+        if location:
+            query = locations.filter_items(query, location)
+        return item_rows(query.order_by(Item.date_posted.desc()))
+
+    items = response_cache.get_or_set(ITEMS, ('category', category_name, location), build)
+    return render_template('category.html', category_name=category_name, items=items, location=location)
 
 
 @app.route('/report-choice/electronics')
@@ -453,13 +751,5 @@ def report_lost(category):
 def report_found(category):
     return render_template('report_found.html', category=category)
 
-@app.route('/static/uploads/<path:filename>')
-def serve_image(filename):
-    return send_from_directory('static/uploads', filename)
-
-# Create tables
-with app.app_context():
-    db.create_all()
-
 if __name__ == '__main__':
     app.run(debug=True)
\ No newline at end of file
@@ -0,0 +1,234 @@
+import re
+import threading
+import time
+from bisect import bisect_left, insort
+from sqlalchemy import event, func, inspect, select
+from sqlalchemy.orm import Session, object_session
+from models import db, Item, Location
+
+
+# In-memory prefix suggestions for the item title and location fields.
+# Each distinct value is stored in a sorted list under every word it contains
+# onwards ("black iphone 13" under "black iphone 13", "iphone 13" and "13"),
+# so a prefix of any word finds it with one bisect. Values are ranked by how
+# many items use them.
+FIELDS = ('title', 'location')
+
+TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+
+# Matches looked at per query before ranking; bounds the cost of one-letter prefixes
+MAX_SCAN = 500
+
+
+def normalize(text):
+    return ' '.join(TOKEN_RE.findall((text or '').lower()))
+
+
+class PrefixIndex:
+    """Sorted (key, value) pairs plus a use count and display form per value."""
+
+    def __init__(self):
+        self._entries = []
+        self._counts = {}
+        self._display = {}
+
+    def __len__(self):
+        return len(self._counts)
+
+    def _keys(self, value):
+        words = value.split()
+        return {' '.join(words[start:]) for start in range(len(words))}
+
+    @classmethod
+    def build(cls, values):
+        """An index of (text, count) pairs, with the entries sorted once at the end."""
+        index = cls()
+        for text, count in values:
+            index._add(text, count, index._entries.append)
+        index._entries.sort()
+        return index
+
+    def add(self, text, count=1):
+        self._add(text, count, lambda entry: insort(self._entries, entry))
+
+    def _add(self, text, count, insert):
+        value = normalize(text)
+        if not value:
+            return
+        if value not in self._counts:
+            self._display[value] = ' '.join(text.split())
+            self._counts[value] = 0
+            for key in self._keys(value):
+                insert((key, value))
+        self._counts[value] += count
+
+    def remove(self, text):
+        value = normalize(text)
+        if value not in self._counts:
+            return
+        self._counts[value] -= 1
+        if self._counts[value] > 0:
+            return
+        del self._counts[value]
+        del self._display[value]
+        for key in self._keys(value):
+            index = bisect_left(self._entries, (key, value))
+            if index < len(self._entries) and self._entries[index] == (key, value):
+                del self._entries[index]
+
+    def suggest(self, prefix, limit=10):
+        prefix = normalize(prefix)
+        if not prefix:
+            return []
+        found = set()
+        index = bisect_left(self._entries, (prefix, ''))
+        end = min(len(self._entries), index + MAX_SCAN)
+        while index < end and self._entries[index][0].startswith(prefix):
+            found.add(self._entries[index][1])
+            index += 1
+        ranked = sorted(found, key=lambda value: (-self._counts[value], len(value), value))
+        return [self._display[value] for value in ranked[:limit]]
+
+
+class Autocomplete:
+    """Per-process prefix indexes over Item.title and Item.location.
+
+    Built from the database on first use and again every AUTOCOMPLETE_TTL
+    seconds, so writes made by other workers show up; writes committed in
+    this process are applied straight away. Gazetteer places are always
+    suggested for the location field.
+    """
+
+    def __init__(self, app=None):
+        self.app = None
+        self._indexes = None
+        self._built_at = 0.0
+        # Changes applied while a build runs, replayed onto the new indexes
+        self._missed = None
+        self._lock = threading.Lock()
+        self._build_lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('AUTOCOMPLETE_TTL', 300)
+        self.app = app
+
+    def suggest(self, field, prefix, limit=10):
+        indexes = self._current()
+        with self._lock:
+            return indexes[field].suggest(prefix, limit)
+
+    def apply(self, changes):
+        with self._lock:
+            if self._missed is not None:
+                self._missed.extend(changes)
+            if self._indexes is not None:
+                _apply(self._indexes, changes)
+
+    def reset(self):
+        with self._lock:
+            self._indexes = None
+
+    def _fresh(self):
+        return self._indexes is not None and time.monotonic() - self._built_at <= self.app.config['AUTOCOMPLETE_TTL']
+
+    def _current(self):
+        with self._lock:
+            if self._fresh():
+                return self._indexes
+            indexes = self._indexes
+        # One build at a time, outside _lock; meanwhile lookups keep using the expired indexes
+        if not self._build_lock.acquire(blocking=indexes is None):
+            return indexes
+        try:
+            with self._lock:
+                if self._fresh():
+                    return self._indexes
+                self._missed = []
+            built_at = time.monotonic()
+            indexes = self._build()
+            with self._lock:
+                _apply(indexes, self._missed)
+                self._indexes, self._built_at, self._missed = indexes, built_at, None
+                return indexes
+        finally:
+            with self._lock:
+                self._missed = None
+            self._build_lock.release()
+
+    def _build(self):
+        indexes = {}
+        for field in FIELDS:
+            column = getattr(Item, field)
+            values = db.session.execute(select(column, func.count()).where(column.isnot(None)).group_by(column)).all()
+            if field == 'location':
+                values += [(path, 1) for path in _place_names()]
+            indexes[field] = PrefixIndex.build(values)
+        return indexes
+
+
+def _apply(indexes, changes):
+    for field, added, removed in changes:
+        if removed:
+            indexes[field].remove(removed)
+        if added:
+            indexes[field].add(added)
+
+
+def _place_names():
+    # "Main Library 2nd floor", built root-first from the gazetteer tree
+    places = {row.id: row for row in db.session.execute(select(Location.id, Location.name, Location.parent_id))}
+    names = []
+    for place in places.values():
+        parts = []
+        node = place
+        while node is not None:
+            parts.append(node.name)
+            node = places.get(node.parent_id)
+        names.append(' '.join(reversed(parts)))
+    return names
+
+
+autocomplete = Autocomplete()
+
+
+# Changes are collected during the flush and applied only once the transaction commits
+def _record(target, changes):
+    session = object_session(target)
+    if session is not None and changes:
+        session.info.setdefault('autocomplete_changes', []).extend(changes)
+
+
+@event.listens_for(Item, 'after_insert')
+def _record_inserted(mapper, connection, target):
+    _record(target, [(field, getattr(target, field), None) for field in FIELDS if getattr(target, field)])
+
+
+@event.listens_for(Item, 'after_update')
+def _record_updated(mapper, connection, target):
+    state = inspect(target)
+    changes = []
+    for field in FIELDS:
+        history = state.attrs[field].history
+        if history.has_changes():
+            changes.append((field, history.added[0] if history.added else None,
+                            history.deleted[0] if history.deleted else None))
+    _record(target, changes)
+
+
+@event.listens_for(Item, 'after_delete')
+def _record_deleted(mapper, connection, target):
+    _record(target, [(field, None, getattr(target, field)) for field in FIELDS if getattr(target, field)])
+
+
+@event.listens_for(Session, 'after_commit')
+def _apply_committed(session):
+    changes = session.info.pop('autocomplete_changes', None)
+    if changes:
+        autocomplete.apply(changes)
+
+
+@event.listens_for(Session, 'after_rollback')
+def _forget_rolled_back(session):
+    session.info.pop('autocomplete_changes', None)
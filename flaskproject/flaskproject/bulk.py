@@ -0,0 +1,255 @@
+import csv
+import io
+import json
+import logging
+from datetime import datetime
+from sqlalchemy import select, or_
+from sqlalchemy.exc import SQLAlchemyError
+from models import db, Item, User
+from passwords import HashPool
+import storage
+from images import image_pipeline
+
+logger = logging.getLogger(__name__)
+
+
+ITEM_STATUSES = ('lost', 'found', 'returned')
+
+# Column limits mirror the Item model
+ITEM_FIELD_LENGTHS = {
+    'title': 100,
+    'category': 50,
+    'location': 100,
+    'status': 20,
+    'image_filename': 255
+}
+
+
+def read_rows(stream, content_type):
+    """Parse a JSON array or a CSV document (with a header row) into row dicts."""
+    if content_type and 'csv' in content_type:
+        text = io.TextIOWrapper(stream, encoding='utf-8-sig', newline='')
+        return csv.DictReader(text)
+    rows = json.load(stream)
+    if not isinstance(rows, list):
+        raise ValueError("Expected a JSON array of items")
+    return rows
+
+
+def validate_item_row(row):
+    """Return (values for Item(...), list of errors) for one input row."""
+    if not isinstance(row, dict):
+        return None, ["Row must be an object"]
+
+    errors = []
+    values = {}
+    for field, max_length in ITEM_FIELD_LENGTHS.items():
+        value = row.get(field)
+        if isinstance(value, str):
+            value = value.strip() or None
+        if value is not None and not isinstance(value, str):
+            errors.append(f"{field} must be a string")
+        elif value is not None and len(value) > max_length:
+            errors.append(f"{field} is longer than {max_length} characters")
+        values[field] = value
+
+    description = row.get('description')
+    values['description'] = description.strip() if isinstance(description, str) else None
+
+    if not values['title']:
+        errors.append("title is required")
+    values['status'] = (values['status'] or 'lost').lower()
+    if values['status'] not in ITEM_STATUSES:
+        errors.append(f"status must be one of {', '.join(ITEM_STATUSES)}")
+    if values['category']:
+        values['category'] = values['category'].lower()
+    # Only a file already in the upload folder (sent through /uploads or /uploads/stream)
+    if isinstance(values['image_filename'], str) and not storage.is_stored(values['image_filename']):
+        errors.append("image_filename is not a stored upload")
+
+    date_posted = row.get('date_posted')
+    if date_posted:
+        try:
+            values['date_posted'] = datetime.fromisoformat(str(date_posted))
+        except ValueError:
+            errors.append("date_posted must be an ISO 8601 date")
+
+    return values, errors
+
+
+def ingest_items(rows, user_id, chunk_size=500, max_rows=None):
+    """Validate rows and insert the valid ones in chunked transactions.
+
+    The photos of each committed chunk are queued for the image workers.
+    Returns one result dict per input row, in input order.
+    """
+    results = []
+    chunk = []
+
+    def flush():
+        items = [Item(user_id=user_id, **values) for _, values in chunk]
+        try:
+            # One flush per chunk lets SQLAlchemy batch the INSERTs into multi-row statements
+            db.session.add_all(items)
+            db.session.flush()
+            item_ids = [item.id for item in items]
+            db.session.commit()
+        except SQLAlchemyError as exc:
+            db.session.rollback()
+            logger.warning("Bulk insert chunk failed: %s", exc)
+            for index, _ in chunk:
+                results[index] = {"row": index, "status": "error", "errors": ["Database error, chunk rolled back"]}
+        else:
+            for (index, _), item_id in zip(chunk, item_ids):
+                results[index] = {"row": index, "status": "created", "item_id": item_id}
+            # Variants and dHash, as for items added one at a time
+            for filename in {values['image_filename'] for _, values in chunk if values['image_filename']}:
+                image_pipeline.submit(filename)
+        chunk.clear()
+
+    for index, row in enumerate(rows):
+        if max_rows is not None and index >= max_rows:
+            results.append({"row": index, "status": "error", "errors": [f"More than {max_rows} rows"]})
+            break
+        values, errors = validate_item_row(row)
+        if errors:
+            results.append({"row": index, "status": "error", "errors": errors})
+            continue
+        results.append(None)
+        chunk.append((index, values))
+        if len(chunk) >= chunk_size:
+            flush()
+    if chunk:
+        flush()
+
+    return results
+
+
+# Column limits mirror the User model
+USER_FIELD_LENGTHS = {
+    'username': 80,
+    'email': 120,
+    'role': 20
+}
+
+
+def validate_user_row(row):
+    """Return (values for User(...) plus 'password', list of errors) for one input row."""
+    if not isinstance(row, dict):
+        return None, ["Row must be an object"]
+
+    errors = []
+    values = {}
+    for field, max_length in USER_FIELD_LENGTHS.items():
+        value = row.get(field)
+        if isinstance(value, str):
+            value = value.strip() or None
+        if value is not None and not isinstance(value, str):
+            errors.append(f"{field} must be a string")
+        elif value is not None and len(value) > max_length:
+            errors.append(f"{field} is longer than {max_length} characters")
+        values[field] = value
+
+    if not values['username']:
+        errors.append("username is required")
+    if not values['email'] or '@' not in values['email']:
+        errors.append("a valid email is required")
+    values['role'] = (values['role'] or 'student').lower()
+
+    password = row.get('password')
+    if not isinstance(password, str) or not password:
+        errors.append("password is required")
+    values['password'] = password
+    return values, errors
+
+
+def existing_users(usernames, emails):
+    """Usernames and emails among the given ones that are already taken, in one query."""
+    rows = db.session.execute(
+        select(User.username, User.email).where(or_(User.username.in_(usernames), User.email.in_(emails)))
+    ).all()
+    return {row.username for row in rows}, {row.email for row in rows}
+
+
+def provision_users(rows, hash_method, salt_length=16, chunk_size=500, max_rows=None, processes=None):
+    """Create users from rows, hashing passwords on a process pool.
+
+    Uniqueness is checked per chunk with one set-based query (plus a check
+    across the input itself) instead of two lookups per user. Returns one
+    result dict per input row, in input order: "created", "conflict" or "error".
+    """
+    results = []
+    chunk = []
+    seen_usernames, seen_emails = set(), set()
+
+    def flush(pool):
+        taken_usernames, taken_emails = existing_users(
+            [values['username'] for _, values in chunk], [values['email'] for _, values in chunk]
+        )
+        accepted = []
+        for index, values in chunk:
+            conflicts = []
+            if values['username'] in taken_usernames:
+                conflicts.append("username already exists")
+            if values['email'] in taken_emails:
+                conflicts.append("email already registered")
+            if conflicts:
+                results[index] = {"row": index, "status": "conflict", "errors": conflicts}
+            else:
+                accepted.append((index, values))
+        chunk.clear()
+        if not accepted:
+            return
+
+        hashes = pool.hash_all([values['password'] for _, values in accepted], hash_method, salt_length)
+        users = [
+            User(username=values['username'], email=values['email'], role=values['role'], password_hash=password_hash)
+            for (_, values), password_hash in zip(accepted, hashes)
+        ]
+        try:
+            db.session.add_all(users)
+            db.session.flush()
+            user_ids = [user.id for user in users]
+            db.session.commit()
+        except SQLAlchemyError as exc:
+            # e.g. a concurrent registration took one of the names since the check
+            db.session.rollback()
+            logger.warning("Bulk user chunk failed: %s", exc)
+            for index, _ in accepted:
+                results[index] = {"row": index, "status": "error", "errors": ["Database error, chunk rolled back"]}
+        else:
+            for (index, _), user_id in zip(accepted, user_ids):
+                results[index] = {"row": index, "status": "created", "user_id": user_id}
+
+    with HashPool(processes) as pool:
+        for index, row in enumerate(rows):
+            if max_rows is not None and index >= max_rows:
+                results.append({"row": index, "status": "error", "errors": [f"More than {max_rows} rows"]})
+                break
+            values, errors = validate_user_row(row)
+            if errors:
+                results.append({"row": index, "status": "error", "errors": errors})
+                continue
+            conflicts = []
+            if values['username'] in seen_usernames:
+                conflicts.append("username repeated in this file")
+            if values['email'] in seen_emails:
+                conflicts.append("email repeated in this file")
+            if conflicts:
+                results.append({"row": index, "status": "conflict", "errors": conflicts})
+                continue
+            seen_usernames.add(values['username'])
+            seen_emails.add(values['email'])
+            results.append(None)
+            chunk.append((index, values))
+            if len(chunk) >= chunk_size:
+                flush(pool)
+        if chunk:
+            flush(pool)
+
+    return results
+
+
+def summarize(results):
+    created = sum(1 for result in results if result["status"] == "created")
+    return {"created": created, "failed": len(results) - created, "results": results}
@@ -0,0 +1,95 @@
+import threading
+import time
+from collections import OrderedDict
+
+
+ITEMS = 'items'
+
+
+def item_key(item_id):
+    return f'item:{item_id}'
+
+
+class ResponseCache:
+    """In-process LRU/TTL cache for built responses, invalidated by version counters.
+
+    Every entry belongs to a collection ('items' for list pages, 'item:<id>'
+    for a single item) and is stored under that collection's current version.
+    Bumping a collection makes all of its entries unreachable at once; they
+    age out through LRU eviction. The cache is per worker process, so writes
+    made by another worker are only picked up once CACHE_TTL expires.
+    """
+
+    def __init__(self, app=None):
+        self._entries = OrderedDict()
+        self._versions = {}
+        self._lock = threading.Lock()
+        self.max_entries = 1024
+        self.ttl = 30.0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('CACHE_MAX_ENTRIES', 1024)
+        app.config.setdefault('CACHE_TTL', 30.0)
+        self.max_entries = app.config['CACHE_MAX_ENTRIES']
+        self.ttl = app.config['CACHE_TTL']
+
+    def version(self, collection):
+        with self._lock:
+            return self._versions.get(collection, 0)
+
+    def bump(self, *collections):
+        with self._lock:
+            for collection in collections:
+                self._versions[collection] = self._versions.get(collection, 0) + 1
+
+    def invalidate_item(self, item_id):
+        # An item change shows up in its own payload and in every list page
+        self.bump(ITEMS, item_key(item_id))
+
+    def get_or_set(self, collection, key, builder):
+        now = time.monotonic()
+        with self._lock:
+            full_key = (collection, self._versions.get(collection, 0), key)
+            entry = self._entries.get(full_key)
+            if entry is not None and entry[0] > now:
+                self._entries.move_to_end(full_key)
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+
+        # Build outside the lock; concurrent misses may build twice, which is harmless
+        value = builder()
+
+        with self._lock:
+            self._entries[full_key] = (now + self.ttl, value)
+            self._entries.move_to_end(full_key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "versions": dict(self._versions)
+            }
+
+
+response_cache = ResponseCache()
@@ -0,0 +1,59 @@
+import hashlib
+from flask import request, make_response
+from sqlalchemy import event, select, text
+from models import db, Item, CollectionVersion
+from cache import ITEMS
+
+
+# Strong validators computed from cheap primary-key reads, so a matching
+# If-None-Match can be answered without loading or serializing any items.
+
+def make_etag(*parts):
+    return hashlib.sha1(repr(parts).encode()).hexdigest()
+
+
+# The list validator is a counter bumped in the same transaction as every item
+# write (and every view-count flush), so it is shared by all workers and read
+# with one row lookup instead of an aggregate over the item table.
+def bump_collection(connection, name=ITEMS):
+    updated = connection.execute(
+        text("UPDATE collection_version SET version = version + 1 WHERE name = :name"), {"name": name}
+    ).rowcount
+    if not updated:
+        connection.execute(CollectionVersion.__table__.insert().values(name=name, version=1))
+
+
+def collection_version(name=ITEMS):
+    return db.session.execute(select(CollectionVersion.version).where(CollectionVersion.name == name)).scalar() or 0
+
+
+@event.listens_for(Item, 'after_insert')
+@event.listens_for(Item, 'after_update')
+@event.listens_for(Item, 'after_delete')
+def _bump_items(mapper, connection, target):
+    bump_collection(connection)
+
+
+def item_version(item_id):
+    row = db.session.query(Item.updated_at, Item.date_posted, Item.views).filter(Item.id == item_id).first()
+    if row is None:
+        return None
+    updated_at, date_posted, views = row
+    return (updated_at or date_posted).isoformat(), views
+
+
+def not_modified(etag):
+    """Return a 304 response if the client already holds this version, else None."""
+    if request.if_none_match.contains(etag):
+        response = make_response('', 304)
+        response.set_etag(etag)
+        response.headers['Cache-Control'] = 'no-cache'
+        return response
+    return None
+
+
+def with_etag(response, etag):
+    response.set_etag(etag)
+    # Clients may store the body but must revalidate before reusing it
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
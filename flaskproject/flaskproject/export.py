@@ -0,0 +1,87 @@
+import csv
+import io
+import json
+import zlib
+from sqlalchemy import select
+from models import db, Item, User
+
+
+# Bulk export of the item table as NDJSON or CSV. Rows are read through a
+# server-side cursor in yield_per batches and encoded as they arrive, so memory
+# stays flat no matter how many items there are.
+EXPORT_FORMATS = {
+    'ndjson': 'application/x-ndjson',
+    'csv': 'text/csv'
+}
+
+EXPORT_COLUMNS = (
+    Item.id, Item.title, Item.description, Item.category, Item.location, Item.status,
+    Item.image_filename, Item.views, Item.date_posted, Item.updated_at, Item.user_id, User.username
+)
+
+# Encoded output is handed on in chunks of about this many bytes
+CHUNK_SIZE = 64 * 1024
+
+
+def iter_rows(batch_size=1000):
+    stmt = (
+        select(*EXPORT_COLUMNS)
+        .outerjoin(User, Item.user_id == User.id)
+        .order_by(Item.id)
+        .execution_options(yield_per=batch_size)
+    )
+    for row in db.session.execute(stmt):
+        yield row._asdict()
+
+
+def _isoformat(value):
+    return value.isoformat() if value is not None else None
+
+
+def ndjson_lines(rows):
+    for row in rows:
+        row['date_posted'] = _isoformat(row['date_posted'])
+        row['updated_at'] = _isoformat(row['updated_at'])
+        yield json.dumps(row, ensure_ascii=False) + '\n'
+
+
+def csv_lines(rows):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow([column.key for column in EXPORT_COLUMNS])
+    for row in rows:
+        writer.writerow([_isoformat(value) if hasattr(value, 'isoformat') else value for value in row.values()])
+        if buffer.tell() >= CHUNK_SIZE:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
+
+def _chunked(lines):
+    parts, size = [], 0
+    for line in lines:
+        data = line.encode('utf-8')
+        parts.append(data)
+        size += len(data)
+        if size >= CHUNK_SIZE:
+            yield b''.join(parts)
+            parts, size = [], 0
+    if parts:
+        yield b''.join(parts)
+
+
+def _gzipped(chunks):
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def export_stream(fmt='ndjson', gzip=False, batch_size=1000):
+    """Yield the encoded export as bytes chunks."""
+    encode = ndjson_lines if fmt == 'ndjson' else csv_lines
+    chunks = _chunked(encode(iter_rows(batch_size)))
+    return _gzipped(chunks) if gzip else chunks
@@ -0,0 +1,71 @@
+from collections import defaultdict
+from sqlalchemy import event, inspect, select, text, func
+from models import db, Item, ItemFacet
+
+
+# Item counts per (category, status), e.g. "12 lost / 3 found" on a category
+# page, read from the small item_facet table instead of a GROUP BY over item.
+# The counters move in the same transaction as the item write, so they are
+# exactly as consistent as the items themselves.
+def _key(category, status):
+    return category or '', status or ''
+
+
+def _adjust(connection, category, status, delta):
+    params = {"category": category, "status": status, "delta": delta}
+    updated = connection.execute(
+        text("UPDATE item_facet SET count = count + :delta WHERE category = :category AND status = :status"), params
+    ).rowcount
+    if not updated:
+        connection.execute(ItemFacet.__table__.insert().values(category=category, status=status, count=delta))
+
+
+@event.listens_for(Item, 'after_insert')
+def _count_inserted(mapper, connection, target):
+    _adjust(connection, *_key(target.category, target.status), 1)
+
+
+@event.listens_for(Item, 'after_update')
+def _count_updated(mapper, connection, target):
+    state = inspect(target)
+    category, status = state.attrs.category.history, state.attrs.status.history
+    if not (category.has_changes() or status.has_changes()):
+        return
+    old_category = category.deleted[0] if category.deleted else target.category
+    old_status = status.deleted[0] if status.deleted else target.status
+    _adjust(connection, *_key(old_category, old_status), -1)
+    _adjust(connection, *_key(target.category, target.status), 1)
+
+
+@event.listens_for(Item, 'after_delete')
+def _count_deleted(mapper, connection, target):
+    _adjust(connection, *_key(target.category, target.status), -1)
+
+
+def counts():
+    """{category: {status: count, ..., 'total': count}} for every category with items."""
+    facets = defaultdict(lambda: {'total': 0})
+    for category, status, count in db.session.execute(
+        select(ItemFacet.category, ItemFacet.status, ItemFacet.count).where(ItemFacet.count > 0)
+    ):
+        facets[category][status] = count
+        facets[category]['total'] += count
+    return dict(facets)
+
+
+def total():
+    """Number of items, summed from the counters rather than counted over item."""
+    return db.session.scalar(select(func.coalesce(func.sum(ItemFacet.count), 0)))
+
+
+def rebuild():
+    """Recompute every counter from the item table. Returns the number of (category, status) pairs."""
+    db.session.execute(ItemFacet.__table__.delete())
+    category, status = func.coalesce(Item.category, ''), func.coalesce(Item.status, '')
+    rows = db.session.execute(select(category, status, func.count()).group_by(category, status)).all()
+    if rows:
+        db.session.execute(ItemFacet.__table__.insert(), [
+            {"category": row[0], "status": row[1], "count": row[2]} for row in rows
+        ])
+    db.session.commit()
+    return len(rows)
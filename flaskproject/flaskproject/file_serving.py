@@ -0,0 +1,79 @@
+import mimetypes
+import os
+import re
+from flask import abort, current_app, request, send_file, make_response
+from werkzeug.security import safe_join
+
+
+# Serving of uploaded files. Content-addressed names (storage.blob_filename and
+# their variants) never change content, so they are cached for a year as
+# immutable; anything else gets a short max-age plus ETag/Last-Modified
+# revalidation. send_file(conditional=True) answers Range and conditional
+# requests. With UPLOAD_OFFLOAD set, only headers are produced and the front
+# server (Apache mod_xsendfile / nginx internal location) streams the bytes.
+HASHED_NAME_RE = re.compile(r'^[0-9a-f]{2}/[0-9a-f]{2}/[0-9a-f]{64}(_[a-z]+)?\.[a-z0-9]+$')
+
+IMMUTABLE_MAX_AGE = 365 * 24 * 3600
+
+# Precompressed siblings tried in order of preference: "<file>.br", "<file>.gz"
+PRECOMPRESSED = (('br', '.br'), ('gzip', '.gz'))
+
+
+def is_immutable(filename):
+    return bool(HASHED_NAME_RE.match(filename))
+
+
+def cache_control(response, filename):
+    if is_immutable(filename):
+        response.headers['Cache-Control'] = f'public, max-age={IMMUTABLE_MAX_AGE}, immutable'
+    else:
+        response.headers['Cache-Control'] = f"public, max-age={current_app.config.get('UPLOAD_CACHE_MAX_AGE', 3600)}"
+    return response
+
+
+def _resolve(filename):
+    # No dot-files or dot-directories (e.g. .incoming partial uploads), nothing outside the folder
+    if any(part.startswith('.') for part in filename.split('/')):
+        abort(404)
+    path = safe_join(current_app.config['UPLOAD_FOLDER'], filename)
+    if path is None or not os.path.isfile(path):
+        abort(404)
+    return path
+
+
+def _precompressed(path):
+    accepted = request.accept_encodings
+    for encoding, suffix in PRECOMPRESSED:
+        if accepted[encoding] and os.path.isfile(path + suffix):
+            return encoding, path + suffix
+    return None, path
+
+
+def _offloaded(path, mimetype):
+    mode = current_app.config.get('UPLOAD_OFFLOAD')
+    response = make_response('')
+    response.mimetype = mimetype
+    if mode == 'x-sendfile':
+        response.headers['X-Sendfile'] = os.path.abspath(path)
+    else:
+        # nginx: an "internal" location aliasing the upload folder
+        prefix = current_app.config.get('UPLOAD_ACCEL_PREFIX', '/protected-uploads/')
+        relative = os.path.relpath(path, current_app.config['UPLOAD_FOLDER']).replace(os.sep, '/')
+        response.headers['X-Accel-Redirect'] = prefix + relative
+    return response
+
+
+def serve_upload(filename):
+    path = _resolve(filename)
+    mimetype = mimetypes.guess_type(path)[0] or 'application/octet-stream'
+    encoding, served_path = _precompressed(path)
+
+    if current_app.config.get('UPLOAD_OFFLOAD'):
+        response = _offloaded(served_path, mimetype)
+    else:
+        response = send_file(served_path, mimetype=mimetype, conditional=True, max_age=None)
+
+    if encoding:
+        response.headers['Content-Encoding'] = encoding
+    response.vary.add('Accept-Encoding')
+    return cache_control(response, filename)
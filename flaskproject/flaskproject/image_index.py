@@ -0,0 +1,145 @@
+import threading
+import time
+from sqlalchemy import select
+from models import db, Item
+
+
+# Near-duplicate photo lookup. Every photo has a 64-bit difference hash
+# (images.dhash, stored as hex in Item.image_hash); similar photos differ in
+# few bits. A BK-tree over the distinct hashes answers "every hash within
+# Hamming distance d" by visiting only the subtrees the triangle inequality
+# allows, instead of comparing against every photo.
+def hamming(a, b):
+    return (a ^ b).bit_count()
+
+
+class BKTree:
+    """BK-tree of 64-bit hashes, each carrying the set of item ids with that hash."""
+
+    def __init__(self):
+        self._root = None
+        self.size = 0
+
+    def add(self, value, item_id):
+        if self._root is None:
+            self._root = (value, {item_id}, {})
+            self.size = 1
+            return
+        node = self._root
+        while True:
+            distance = hamming(value, node[0])
+            if distance == 0:
+                node[1].add(item_id)
+                return
+            child = node[2].get(distance)
+            if child is None:
+                node[2][distance] = (value, {item_id}, {})
+                self.size += 1
+                return
+            node = child
+
+    def search(self, value, max_distance):
+        """Yield (distance, item_ids) for every stored hash within max_distance of value."""
+        if self._root is None:
+            return
+        stack = [self._root]
+        while stack:
+            node_value, item_ids, children = stack.pop()
+            distance = hamming(value, node_value)
+            if distance <= max_distance:
+                yield distance, item_ids
+            for edge in range(max(distance - max_distance, 1), distance + max_distance + 1):
+                child = children.get(edge)
+                if child is not None:
+                    stack.append(child)
+
+
+class ImageIndex:
+    """Per-process BK-tree over Item.image_hash.
+
+    Built from the database on first use and again once IMAGE_INDEX_TTL
+    seconds have passed, so hashes written by other workers show up; hashes
+    computed in this process are added straight away. Lookups return
+    candidate ids only: callers re-read the items, which drops deleted ones.
+    """
+
+    def __init__(self, app=None):
+        self.app = None
+        self._tree = None
+        self._built_at = 0.0
+        # Hashes added while a build runs, replayed onto the new tree
+        self._missed = None
+        self._lock = threading.Lock()
+        self._build_lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('IMAGE_INDEX_TTL', 300)
+        self.app = app
+
+    def add(self, image_hash, item_ids):
+        with self._lock:
+            if self._missed is not None:
+                self._missed.append((image_hash, item_ids))
+            if self._tree is not None:
+                _add(self._tree, image_hash, item_ids)
+
+    def reset(self):
+        with self._lock:
+            self._tree = None
+
+    def similar(self, image_hash, max_distance):
+        """Return [(distance, item_id)] within max_distance of image_hash, closest first."""
+        tree = self._current()
+        # Under the lock: add() grows the same node sets and child maps
+        with self._lock:
+            results = [
+                (distance, item_id)
+                for distance, item_ids in tree.search(int(image_hash, 16), max_distance)
+                for item_id in item_ids
+            ]
+        return sorted(results)
+
+    def _fresh(self):
+        return self._tree is not None and time.monotonic() - self._built_at <= self.app.config['IMAGE_INDEX_TTL']
+
+    def _current(self):
+        with self._lock:
+            if self._fresh():
+                return self._tree
+            tree = self._tree
+        # One build at a time, outside _lock; meanwhile lookups keep using the expired tree
+        if not self._build_lock.acquire(blocking=tree is None):
+            return tree
+        try:
+            with self._lock:
+                if self._fresh():
+                    return self._tree
+                self._missed = []
+            built_at = time.monotonic()
+            tree = self._build()
+            with self._lock:
+                for image_hash, item_ids in self._missed:
+                    _add(tree, image_hash, item_ids)
+                self._tree, self._built_at, self._missed = tree, built_at, None
+                return tree
+        finally:
+            with self._lock:
+                self._missed = None
+            self._build_lock.release()
+
+    def _build(self):
+        tree = BKTree()
+        rows = db.session.execute(select(Item.id, Item.image_hash).where(Item.image_hash.isnot(None)))
+        for item_id, image_hash in rows:
+            tree.add(int(image_hash, 16), item_id)
+        return tree
+
+
+def _add(tree, image_hash, item_ids):
+    for item_id in item_ids:
+        tree.add(int(image_hash, 16), item_id)
+
+
+image_index = ImageIndex()
@@ -0,0 +1,275 @@
+import logging
+import os
+import queue
+import tempfile
+import threading
+from PIL import Image, ImageOps, UnidentifiedImageError
+from sqlalchemy import select, update
+from models import db, Item
+from cache import response_cache, ITEMS, item_key
+import storage
+from etag import bump_collection
+from image_index import image_index
+
+logger = logging.getLogger(__name__)
+
+
+# Resized copies written next to each upload: longest side in pixels.
+# Every size is stored as JPEG and WebP.
+VARIANT_SIZES = {
+    'thumb': 320,
+    'medium': 1024
+}
+VARIANT_FORMATS = {
+    'jpg': ('JPEG', {'quality': 82, 'optimize': True, 'progressive': True}),
+    'webp': ('WEBP', {'quality': 80, 'method': 4})
+}
+
+# Full-size copy of the original without its metadata, served in its place once
+# processed. The original itself is never rewritten: its name is the hash of its bytes.
+FULL_VARIANT = 'full'
+
+# dHash grid: DHASH_SIZE x DHASH_SIZE brightness comparisons, one bit each
+DHASH_SIZE = 8
+
+# Guard against decompression bombs before decoding anything
+Image.MAX_IMAGE_PIXELS = 40_000_000
+
+
+def variant_filename(filename, variant, ext):
+    stem = filename.rsplit('.', 1)[0]
+    return f"{stem}_{variant}.{ext}"
+
+
+def full_filename(filename):
+    return variant_filename(filename, FULL_VARIANT, filename.rsplit('.', 1)[-1])
+
+
+def variant_filenames(filename):
+    """Every file the pipeline derives from filename."""
+    names = [variant_filename(filename, variant, ext) for variant in VARIANT_SIZES for ext in VARIANT_FORMATS]
+    names.append(full_filename(filename))
+    return names
+
+
+def public_filename(filename, processed):
+    # The metadata-free copy once it exists, else the upload as sent
+    return full_filename(filename) if processed else filename
+
+
+def variant_urls(filename, base_url):
+    """URLs of every variant of filename, e.g. {'thumb': ..., 'thumb_webp': ...}."""
+    urls = {}
+    for variant in VARIANT_SIZES:
+        for ext in VARIANT_FORMATS:
+            key = variant if ext == 'jpg' else f"{variant}_{ext}"
+            urls[key] = f"{base_url}{variant_filename(filename, variant, ext)}"
+    return urls
+
+
+def _save_atomic(image, path, fmt, options):
+    # A temporary name of its own: another worker or process may be writing the same file
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as tmp:
+            image.save(tmp, fmt, **options)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def dhash(image):
+    """64-bit difference hash of an image, as 16 hex digits.
+
+    Each bit says whether a pixel of a tiny grayscale copy is brighter than
+    its right-hand neighbour, so it survives resizing, recompression and
+    small edits; similar photos differ in few bits.
+    """
+    gray = image.convert('L').resize((DHASH_SIZE + 1, DHASH_SIZE), Image.LANCZOS)
+    pixels = list(gray.getdata())
+    bits = 0
+    for row in range(DHASH_SIZE):
+        for col in range(DHASH_SIZE):
+            left = pixels[row * (DHASH_SIZE + 1) + col]
+            bits = (bits << 1) | (left > pixels[row * (DHASH_SIZE + 1) + col + 1])
+    return f"{bits:016x}"
+
+
+def file_dhash(path):
+    with Image.open(path) as image:
+        return dhash(ImageOps.exif_transpose(image))
+
+
+def variants_exist(upload_folder, filename):
+    return all(os.path.exists(os.path.join(upload_folder, name)) for name in variant_filenames(filename))
+
+
+def process_image(upload_folder, filename):
+    """Validate one upload and write every variant of it, EXIF-free.
+
+    Returns the dHash of the photo. Raises ValueError if the file is not a
+    decodable image, and OSError if it can't be read or the variants can't
+    be written.
+    """
+    path = os.path.join(upload_folder, filename)
+    # Opened here so a missing or unreadable file is an OSError, not a bad image
+    with open(path, 'rb') as source:
+        try:
+            with Image.open(source) as probe:
+                probe.verify()
+            source.seek(0)
+            image = Image.open(source)
+            image.load()
+        except (UnidentifiedImageError, Image.DecompressionBombError, SyntaxError, OSError) as exc:
+            # Pillow reports truncated and corrupt data as plain OSError (or SyntaxError from verify())
+            raise ValueError(f"{filename} is not a valid image: {exc}") from exc
+
+    with image:
+        original_format = image.format
+        # Apply the camera orientation to the pixels before the EXIF data is dropped
+        image = ImageOps.exif_transpose(image)
+
+        # Re-encode the full-size copy without metadata (location, device) unless it's a GIF,
+        # which carries no EXIF and may be animated: that one is the original's bytes
+        full_path = os.path.join(upload_folder, full_filename(filename))
+        if original_format in ('JPEG', 'PNG', 'WEBP'):
+            options = {'quality': 90} if original_format != 'PNG' else {'optimize': True}
+            _save_atomic(image, full_path, original_format, options)
+        else:
+            try:
+                os.link(path, full_path)
+            except FileExistsError:
+                pass
+
+        if image.mode not in ('RGB', 'L'):
+            image = image.convert('RGB')
+
+        for variant, size in VARIANT_SIZES.items():
+            resized = image.copy()
+            resized.thumbnail((size, size), Image.LANCZOS)
+            for ext, (fmt, options) in VARIANT_FORMATS.items():
+                _save_atomic(resized, os.path.join(upload_folder, variant_filename(filename, variant, ext)), fmt, options)
+
+        return dhash(image)
+
+
+class ImagePipeline:
+    """Processes uploaded images on a small pool of worker threads.
+
+    Requests save the original and call submit(); the variants appear once a
+    worker has processed the file, at which point Item.image_processed is set.
+    Pillow releases the GIL while decoding, resizing and encoding, so threads
+    give real parallelism here.
+    """
+
+    def __init__(self, app=None):
+        self.app = None
+        self._queue = None
+        self._threads = []
+        # Files being processed, and whether another run was asked for meanwhile
+        self._active = {}
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('IMAGE_WORKERS', 2)
+        app.config.setdefault('IMAGE_QUEUE_SIZE', 256)
+        self.app = app
+        self._queue = queue.Queue(maxsize=app.config['IMAGE_QUEUE_SIZE'])
+
+    def submit(self, filename):
+        if not filename:
+            return False
+        self._ensure_workers()
+        try:
+            self._queue.put_nowait(filename)
+        except queue.Full:
+            # The item stays unprocessed; `flask process-images` picks it up later
+            logger.warning("Image queue full, deferring %s", filename)
+            return False
+        return True
+
+    def join(self):
+        self._queue.join()
+
+    def process(self, filename):
+        # Items sharing a photo share its file, so a file is processed by one thread at a
+        # time; a request arriving meanwhile runs once more afterwards, for items added since
+        with self._lock:
+            if filename in self._active:
+                self._active[filename] = True
+                return False
+            self._active[filename] = False
+        try:
+            while True:
+                processed = self._process(filename)
+                with self._lock:
+                    if not self._active[filename]:
+                        return processed
+                    self._active[filename] = False
+        finally:
+            with self._lock:
+                self._active.pop(filename, None)
+
+    def _process(self, filename):
+        with self.app.app_context():
+            folder = self.app.config['UPLOAD_FOLDER']
+            try:
+                # Uploads are content-addressed, so a re-uploaded photo already has its variants
+                path = os.path.join(folder, filename)
+                if variants_exist(folder, filename):
+                    image_hash = file_dhash(path)
+                else:
+                    image_hash = process_image(folder, filename)
+            except ValueError:
+                logger.warning("Rejected upload %s", filename, exc_info=True)
+                self._mark(filename, processed=False, reject=True)
+                return False
+            except OSError:
+                # Not the upload's fault: the items stay unprocessed for `flask process-images`
+                logger.warning("Could not process upload %s", filename, exc_info=True)
+                return False
+            self._mark(filename, processed=True, image_hash=image_hash)
+            return True
+
+    def _mark(self, filename, processed, reject=False, image_hash=None):
+        item_ids = db.session.execute(select(Item.id).where(Item.image_filename == filename)).scalars().all()
+        values = {'image_processed': processed, 'image_hash': image_hash}
+        if reject:
+            # Don't keep serving a file that isn't an image
+            values['image_filename'] = None
+        if item_ids:
+            db.session.execute(update(Item).where(Item.id.in_(item_ids)).values(**values))
+            bump_collection(db.session)
+            db.session.commit()
+            response_cache.bump(ITEMS, *(item_key(item_id) for item_id in item_ids))
+            if image_hash:
+                image_index.add(image_hash, item_ids)
+        if reject:
+            # Every reference was just cleared, so the blob goes regardless of its count
+            storage.discard(filename)
+
+    def _ensure_workers(self):
+        # Started lazily so each forked worker process gets its own threads
+        with self._lock:
+            self._threads = [thread for thread in self._threads if thread.is_alive()]
+            for index in range(len(self._threads), self.app.config['IMAGE_WORKERS']):
+                thread = threading.Thread(target=self._run, name=f'image-worker-{index}', daemon=True)
+                thread.start()
+                self._threads.append(thread)
+
+    def _run(self):
+        while True:
+            filename = self._queue.get()
+            try:
+                self.process(filename)
+            except Exception:
+                logger.exception("Image processing failed for %s", filename)
+            finally:
+                self._queue.task_done()
+
+
+image_pipeline = ImagePipeline()
@@ -0,0 +1,167 @@
+import re
+from sqlalchemy import event, inspect, select, update
+from models import db, Item, Location, LocationAlias, LocationClosure
+from etag import bump_collection
+
+
+# Gazetteer of campus places. Locations form a tree (building > floor > room);
+# location_closure holds every (ancestor, descendant) pair so "everything in
+# the library" is one indexed lookup instead of a recursive walk. Free-text
+# Item.location is resolved to Item.location_id through location_alias when
+# the item is written: the longest leading run of words that is a known alias
+# wins, so "Lib L2 near the printers" resolves to the library's second floor.
+KINDS = ('building', 'floor', 'room')
+
+TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+
+FILLER_WORDS = frozenset(('the', 'at', 'in', 'on', 'of'))
+
+
+def normalize(text):
+    return ' '.join(token for token in TOKEN_RE.findall((text or '').lower()) if token not in FILLER_WORDS)
+
+
+def slugify(name):
+    return '-'.join(TOKEN_RE.findall(name.lower()))
+
+
+def _prefixes(text):
+    tokens = normalize(text).split()
+    return [' '.join(tokens[:end]) for end in range(len(tokens), 0, -1)]
+
+
+def resolve(text, connection=None):
+    """Return the id of the location text refers to, or None."""
+    prefixes = _prefixes(text)
+    if not prefixes:
+        return None
+    stmt = select(LocationAlias.alias, LocationAlias.location_id).where(LocationAlias.alias.in_(prefixes))
+    found = dict((connection or db.session).execute(stmt).all())
+    for prefix in prefixes:
+        if prefix in found:
+            return found[prefix]
+    return None
+
+
+def find(value):
+    """Location id for a ?location= value: an id, a slug ("library/2nd-floor") or any alias."""
+    value = (value or '').strip()
+    if not value:
+        return None
+    if value.isdigit():
+        location = db.session.get(Location, int(value))
+        return location.id if location else None
+    location_id = db.session.scalar(select(Location.id).where(Location.slug == value.lower()))
+    return location_id if location_id is not None else resolve(value)
+
+
+def filter_items(query, value):
+    """Restrict an Item query to items at the given location or anywhere inside it."""
+    location_id = find(value)
+    if location_id is None:
+        return query.filter(db.false())
+    within = select(LocationClosure.descendant_id).where(LocationClosure.ancestor_id == location_id)
+    return query.filter(Item.location_id.in_(within))
+
+
+def ancestors(location_id):
+    """Ids of the location and everything containing it, nearest first."""
+    return db.session.execute(
+        select(LocationClosure.ancestor_id)
+        .where(LocationClosure.descendant_id == location_id)
+        .order_by(LocationClosure.depth)
+    ).scalars().all()
+
+
+# Items resolve their location in the same flush that writes them
+@event.listens_for(Item, 'before_insert')
+def _resolve_inserted(mapper, connection, target):
+    if target.location_id is None and target.location:
+        target.location_id = resolve(target.location, connection)
+
+
+@event.listens_for(Item, 'before_update')
+def _resolve_updated(mapper, connection, target):
+    state = inspect(target)
+    if state.attrs.location.history.has_changes() and not state.attrs.location_id.history.has_changes():
+        target.location_id = resolve(target.location, connection)
+
+
+def add_location(name, parent=None, kind=None, aliases=()):
+    """Create a location under parent (a Location or None) with its closure rows and aliases.
+
+    Besides its own name and aliases, a child is reachable as every
+    combination of a parent alias followed by one of its own ("lib l2").
+    Aliases already taken by another location are skipped; they are returned.
+    """
+    depth = 0 if parent is None else len(ancestors(parent.id))
+    slug = slugify(name) if parent is None else f"{parent.slug}/{slugify(name)}"
+    location = Location(name=name, kind=kind or KINDS[min(depth, len(KINDS) - 1)],
+                        parent_id=parent.id if parent else None, slug=slug)
+    db.session.add(location)
+    db.session.flush()
+
+    db.session.add(LocationClosure(ancestor_id=location.id, descendant_id=location.id, depth=0))
+    if parent is not None:
+        for ancestor_id, ancestor_depth in db.session.execute(
+            select(LocationClosure.ancestor_id, LocationClosure.depth).where(LocationClosure.descendant_id == parent.id)
+        ).all():
+            db.session.add(LocationClosure(ancestor_id=ancestor_id, descendant_id=location.id, depth=ancestor_depth + 1))
+
+    own = {normalize(name)} | {normalize(alias) for alias in aliases}
+    if parent is None:
+        full = own
+    else:
+        parent_aliases = db.session.execute(
+            select(LocationAlias.alias).where(LocationAlias.location_id == parent.id)
+        ).scalars().all()
+        full = {f"{prefix} {alias}" for prefix in parent_aliases for alias in own}
+    return location, _add_aliases(location.id, full)
+
+
+def _add_aliases(location_id, aliases):
+    aliases = {alias for alias in aliases if alias}
+    taken = set(db.session.execute(
+        select(LocationAlias.alias).where(LocationAlias.alias.in_(aliases))
+    ).scalars())
+    for alias in aliases - taken:
+        db.session.add(LocationAlias(alias=alias, location_id=location_id))
+    db.session.flush()
+    return sorted(taken)
+
+
+def load(entries, parent=None):
+    """Create the locations of a nested gazetteer, skipping ones that already exist.
+
+    Each entry is {"name": ..., "aliases": [...], "kind": ..., "children": [...]}.
+    Returns (locations created, aliases skipped because another place has them).
+    """
+    created, skipped = 0, []
+    for entry in entries:
+        slug = slugify(entry['name']) if parent is None else f"{parent.slug}/{slugify(entry['name'])}"
+        location = Location.query.filter_by(slug=slug).first()
+        if location is None:
+            location, taken = add_location(entry['name'], parent, entry.get('kind'), entry.get('aliases', ()))
+            created += 1
+            skipped += taken
+        child_created, child_skipped = load(entry.get('children', ()), location)
+        created += child_created
+        skipped += child_skipped
+    return created, skipped
+
+
+def relocate_items(batch_size=1000):
+    """Re-resolve Item.location_id for every item. Returns how many changed."""
+    aliases = dict(db.session.execute(select(LocationAlias.alias, LocationAlias.location_id)).all())
+    changed = 0
+    rows = db.session.execute(select(Item.id, Item.location, Item.location_id)).all()
+    for start in range(0, len(rows), batch_size):
+        for item_id, location, current in rows[start:start + batch_size]:
+            resolved = next((aliases[prefix] for prefix in _prefixes(location) if prefix in aliases), None)
+            if resolved != current:
+                db.session.execute(update(Item).where(Item.id == item_id).values(location_id=resolved))
+                changed += 1
+        if changed:
+            bump_collection(db.session)
+        db.session.commit()
+    return changed
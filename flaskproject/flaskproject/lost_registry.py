@@ -0,0 +1,79 @@
+from datetime import datetime
+from sqlalchemy import select, insert, update, delete
+from models import db, LostReport
+
+
+# The per-category "lost" reports, stored in the lost_report table so every
+# worker process sees the same data. Ids are allocated monotonically by the
+# database (SQLite AUTOINCREMENT never reuses a deleted id), and every lookup,
+# update and delete goes through the primary key.
+CATEGORIES = ('electronics', 'accessories', 'documents', 'keys', 'clothing', 'other')
+
+FIELDS = ('item_name', 'location', 'date_lost', 'description', 'contact')
+
+_table = LostReport.__table__
+_columns = (_table.c.id, _table.c.category, *(_table.c[name] for name in FIELDS))
+
+
+class LostRecord:
+    """One report. Compact, and readable both as record.item_name and record['item_name']."""
+
+    __slots__ = ('id', 'category') + FIELDS
+
+    def __init__(self, id, category, item_name, location, date_lost, description, contact):
+        self.id = id
+        self.category = category
+        self.item_name = item_name
+        self.location = location
+        self.date_lost = date_lost
+        self.description = description
+        self.contact = contact
+
+    def __getitem__(self, key):
+        try:
+            return getattr(self, key)
+        except AttributeError:
+            raise KeyError(key) from None
+
+    def __repr__(self):
+        return f"LostRecord(id={self.id!r}, category={self.category!r}, item_name={self.item_name!r})"
+
+
+class LostRegistry:
+    """The lost reports of each category, backed by the shared database."""
+
+    def list(self, category):
+        rows = db.session.execute(select(*_columns).where(_table.c.category == category).order_by(_table.c.id))
+        return [LostRecord(*row) for row in rows]
+
+    def get(self, category, report_id):
+        row = db.session.execute(
+            select(*_columns).where(_table.c.id == report_id, _table.c.category == category)
+        ).first()
+        return LostRecord(*row) if row else None
+
+    def add(self, category, **fields):
+        values = {name: fields.get(name) for name in FIELDS}
+        report_id = db.session.execute(
+            insert(_table).values(category=category, created_at=datetime.utcnow(), **values)
+        ).inserted_primary_key[0]
+        db.session.commit()
+        return report_id
+
+    def update(self, category, report_id, **fields):
+        values = {name: fields[name] for name in FIELDS if name in fields}
+        updated = db.session.execute(
+            update(_table).where(_table.c.id == report_id, _table.c.category == category).values(**values)
+        ).rowcount
+        db.session.commit()
+        return bool(updated)
+
+    def delete(self, category, report_id):
+        deleted = db.session.execute(
+            delete(_table).where(_table.c.id == report_id, _table.c.category == category)
+        ).rowcount
+        db.session.commit()
+        return bool(deleted)
+
+
+lost_items = LostRegistry()
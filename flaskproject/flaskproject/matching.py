@@ -0,0 +1,224 @@
+import heapq
+import logging
+import math
+import re
+from collections import defaultdict
+from flask import current_app
+from sqlalchemy import event, inspect, select, delete, func, or_
+from sqlalchemy.exc import SQLAlchemyError
+from models import db, Item, ItemTerm, ItemMatch
+import facets
+
+logger = logging.getLogger(__name__)
+
+
+# Lost/found matching over an inverted index (item_term). Every item is indexed
+# under prefixed terms:
+#   c:<category>               the category
+#   l:<normalized location>    the whole location, e.g. "l:library 2nd floor",
+#                              or "l:#<location_id>" once resolved by the gazetteer
+#   w:<token>                  words of the title, description and location
+# A new item is scored only against items of the opposite status that share
+# one of its location or word terms, weighted by inverse document frequency,
+# with a bonus for the same category. The best MATCH_TOP_K are kept in
+# item_match for both sides.
+OPPOSITE_STATUS = {'lost': 'found', 'found': 'lost'}
+
+TERM_WEIGHTS = {'c': 2.0, 'l': 3.0, 'w': 1.0}
+
+TERM_LENGTH = 120
+
+TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+
+STOPWORDS = frozenset((
+    'a', 'an', 'and', 'are', 'as', 'at', 'by', 'for', 'from', 'has', 'have', 'in', 'is', 'it', 'its',
+    'my', 'near', 'of', 'on', 'or', 'the', 'this', 'to', 'was', 'were', 'with', 'lost', 'found'
+))
+
+INDEXED_FIELDS = ('title', 'description', 'category', 'location', 'location_id')
+
+# A term shared by at most this many items always selects candidates, however small the table
+MIN_DF_CAP = 100
+
+
+def stem(token):
+    # Plural folding is enough to pair "keys" with "key"
+    if len(token) > 3 and token.endswith('s') and not token.endswith('ss'):
+        return token[:-1]
+    return token
+
+
+def tokenize(text):
+    return [stem(token) for token in TOKEN_RE.findall((text or '').lower())
+            if len(token) > 1 and token not in STOPWORDS]
+
+
+def normalize_location(location):
+    return ' '.join(token for token in TOKEN_RE.findall((location or '').lower()) if token not in STOPWORDS)
+
+
+def item_terms(title, description, category, location, location_id=None):
+    terms = set()
+    if category:
+        terms.add(f"c:{category.strip().lower()}")
+    # A gazetteer place pairs "Library 2nd floor" with "Lib L2"
+    place = f"#{location_id}" if location_id else normalize_location(location)
+    if place:
+        terms.add(f"l:{place}")
+    for text in (title, description, location):
+        terms.update(f"w:{token}" for token in tokenize(text))
+    return {term[:TERM_LENGTH] for term in terms}
+
+
+def term_weight(term):
+    return TERM_WEIGHTS[term.split(':', 1)[0]]
+
+
+# The index follows the item table in the same transaction, whichever route wrote the row
+def _insert_terms(connection, target):
+    terms = item_terms(*(getattr(target, name) for name in INDEXED_FIELDS))
+    if terms:
+        connection.execute(ItemTerm.__table__.insert(), [{"term": term, "item_id": target.id} for term in terms])
+
+
+@event.listens_for(Item, 'after_insert')
+def _index_inserted_item(mapper, connection, target):
+    _insert_terms(connection, target)
+
+
+@event.listens_for(Item, 'after_update')
+def _index_updated_item(mapper, connection, target):
+    state = inspect(target)
+    if not any(state.attrs[name].history.has_changes() for name in INDEXED_FIELDS):
+        return
+    connection.execute(delete(ItemTerm.__table__).where(ItemTerm.__table__.c.item_id == target.id))
+    _insert_terms(connection, target)
+
+
+@event.listens_for(Item, 'before_delete')
+def _unindex_deleted_item(mapper, connection, target):
+    # Before the item row goes, so the foreign keys never dangle
+    connection.execute(delete(ItemTerm.__table__).where(ItemTerm.__table__.c.item_id == target.id))
+    connection.execute(delete(ItemMatch.__table__).where(
+        or_(ItemMatch.__table__.c.item_id == target.id, ItemMatch.__table__.c.match_id == target.id)
+    ))
+
+
+def find_matches(item, top_k=10, min_score=1.0, max_df_ratio=0.2):
+    """Return up to top_k (score, item_id) pairs for item, best first.
+
+    Only items reached through the index are scored. Terms carried by more
+    than max_df_ratio of all items (and more than MIN_DF_CAP of them) are
+    too common to select candidates.
+    """
+    opposite = OPPOSITE_STATUS.get((item.status or '').lower())
+    if opposite is None:
+        return []
+    terms = item_terms(*(getattr(item, name) for name in INDEXED_FIELDS))
+    if not terms:
+        return []
+
+    # From the facet counters: a count(*) over item would scan the table on every write
+    total = facets.total() or 1
+    document_frequency = dict(db.session.execute(
+        select(ItemTerm.term, func.count()).where(ItemTerm.term.in_(terms)).group_by(ItemTerm.term)
+    ).all())
+
+    def idf(term):
+        return math.log(1 + total / max(document_frequency.get(term, 1), 1))
+
+    cap = max(MIN_DF_CAP, total * max_df_ratio)
+    selective = [term for term in terms
+                 if not term.startswith('c:') and document_frequency.get(term, 0) <= cap]
+    if not selective:
+        return []
+
+    scores = defaultdict(float)
+    postings = db.session.execute(
+        select(ItemTerm.item_id, ItemTerm.term)
+        .join(Item, Item.id == ItemTerm.item_id)
+        .where(ItemTerm.term.in_(selective), Item.status == opposite, ItemTerm.item_id != item.id)
+    )
+    for candidate_id, term in postings:
+        scores[candidate_id] += term_weight(term) * idf(term)
+
+    category_terms = [term for term in terms if term.startswith('c:')]
+    if scores and category_terms:
+        same_category = db.session.execute(
+            select(ItemTerm.item_id).where(ItemTerm.term == category_terms[0], ItemTerm.item_id.in_(scores))
+        ).scalars()
+        bonus = term_weight(category_terms[0]) * idf(category_terms[0])
+        for candidate_id in same_category:
+            scores[candidate_id] += bonus
+
+    best = heapq.nlargest(top_k, scores.items(), key=lambda entry: (entry[1], entry[0]))
+    return [(round(score, 4), candidate_id) for candidate_id, score in best if score >= min_score]
+
+
+def _prune(item_id, top_k):
+    surplus = db.session.execute(
+        select(ItemMatch.match_id).where(ItemMatch.item_id == item_id)
+        .order_by(ItemMatch.score.desc(), ItemMatch.match_id.desc()).offset(top_k)
+    ).scalars().all()
+    if surplus:
+        db.session.execute(delete(ItemMatch).where(ItemMatch.item_id == item_id, ItemMatch.match_id.in_(surplus)))
+
+
+def store_matches(item, matches, top_k=10, reciprocal=True):
+    """Replace item's matches; with reciprocal, also offer item to each match's own top_k."""
+    db.session.execute(delete(ItemMatch).where(or_(ItemMatch.item_id == item.id, ItemMatch.match_id == item.id)))
+    for score, match_id in matches:
+        db.session.add(ItemMatch(item_id=item.id, match_id=match_id, score=score))
+        if reciprocal:
+            db.session.add(ItemMatch(item_id=match_id, match_id=item.id, score=score))
+    db.session.flush()
+    if reciprocal:
+        for _, match_id in matches:
+            _prune(match_id, top_k)
+
+
+def _settings():
+    config = current_app.config
+    return config.get('MATCH_TOP_K', 10), config.get('MATCH_MIN_SCORE', 1.0), config.get('MATCH_MAX_DF_RATIO', 0.2)
+
+
+def refresh_matches(item):
+    """Recompute and store the matches of one item. Call after the item is committed.
+
+    Matches are derived data: a failure is logged and left for
+    `flask rebuild-matches` rather than failing the request.
+    """
+    top_k, min_score, max_df_ratio = _settings()
+    try:
+        matches = find_matches(item, top_k, min_score, max_df_ratio)
+        store_matches(item, matches, top_k)
+        db.session.commit()
+    except SQLAlchemyError:
+        db.session.rollback()
+        logger.exception("Could not refresh matches for item %s", item.id)
+        return []
+    return matches
+
+
+def rebuild(batch_size=1000):
+    """Rebuild the whole index and every item's matches. Returns (items indexed, matches stored)."""
+    db.session.execute(delete(ItemTerm))
+    db.session.execute(delete(ItemMatch))
+    rows = db.session.execute(select(Item.id, *(getattr(Item, name) for name in INDEXED_FIELDS))).all()
+    for row in rows:
+        terms = item_terms(row.title, row.description, row.category, row.location, row.location_id)
+        if terms:
+            db.session.execute(ItemTerm.__table__.insert(), [{"term": term, "item_id": row.id} for term in terms])
+    db.session.commit()
+
+    top_k, min_score, max_df_ratio = _settings()
+    item_ids = db.session.execute(select(Item.id).where(Item.status.in_(OPPOSITE_STATUS))).scalars().all()
+    stored = 0
+    for start in range(0, len(item_ids), batch_size):
+        # Every item gets its own turn, so nothing has to be written reciprocally
+        for item in Item.query.filter(Item.id.in_(item_ids[start:start + batch_size])):
+            matches = find_matches(item, top_k, min_score, max_df_ratio)
+            db.session.add_all(ItemMatch(item_id=item.id, match_id=match_id, score=score) for score, match_id in matches)
+            stored += len(matches)
+        db.session.commit()
+    return len(rows), stored
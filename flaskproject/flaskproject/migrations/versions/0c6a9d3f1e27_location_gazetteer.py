@@ -0,0 +1,82 @@
+"""location gazetteer
+
+Revision ID: 0c6a9d3f1e27
+Revises: b4f81c2d6e93
+Create Date: 2026-10-18 14:30:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0c6a9d3f1e27'
+down_revision = 'b4f81c2d6e93'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('location',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('name', sa.String(length=100), nullable=False),
+    sa.Column('kind', sa.String(length=20), nullable=False),
+    sa.Column('parent_id', sa.Integer(), nullable=True),
+    sa.Column('slug', sa.String(length=255), nullable=False),
+    sa.ForeignKeyConstraint(['parent_id'], ['location.id'], ),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('slug')
+    )
+    op.create_table('location_alias',
+    sa.Column('alias', sa.String(length=255), nullable=False),
+    sa.Column('location_id', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['location_id'], ['location.id'], ),
+    sa.PrimaryKeyConstraint('alias')
+    )
+    op.create_table('location_closure',
+    sa.Column('ancestor_id', sa.Integer(), nullable=False),
+    sa.Column('descendant_id', sa.Integer(), nullable=False),
+    sa.Column('depth', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['ancestor_id'], ['location.id'], ),
+    sa.ForeignKeyConstraint(['descendant_id'], ['location.id'], ),
+    sa.PrimaryKeyConstraint('ancestor_id', 'descendant_id')
+    )
+    with op.batch_alter_table('location_closure', schema=None) as batch_op:
+        batch_op.create_index('ix_location_closure_descendant_id', ['descendant_id'], unique=False)
+
+    # SQLite can add a referencing column in place; a batch copy of item would trip over
+    # its DESC expression indexes
+    if op.get_bind().dialect.name == 'sqlite':
+        op.execute("ALTER TABLE item ADD COLUMN location_id INTEGER REFERENCES location (id)")
+    else:
+        op.add_column('item', sa.Column('location_id', sa.Integer(), nullable=True))
+        op.create_foreign_key('fk_item_location_id_location', 'item', 'location', ['location_id'], ['id'])
+    op.create_index('ix_item_location_id_date_posted', 'item', ['location_id', sa.literal_column('date_posted DESC')], unique=False)
+    # Load places with `flask load-locations`, then resolve existing items with `flask relocate-items`
+
+
+def downgrade():
+    op.drop_index('ix_item_location_id_date_posted', table_name='item')
+    if op.get_bind().dialect.name == 'sqlite':
+        # The batch copy can't carry the DESC expression indexes over, so they are rebuilt around it
+        desc_indexes = {
+            'ix_item_date_posted': [sa.literal_column('date_posted DESC'), sa.literal_column('id DESC')],
+            'ix_item_category_date_posted': ['category', sa.literal_column('date_posted DESC')],
+            'ix_item_user_id_date_posted': ['user_id', sa.literal_column('date_posted DESC')],
+        }
+        for name in desc_indexes:
+            op.drop_index(name, table_name='item')
+        with op.batch_alter_table('item', schema=None) as batch_op:
+            batch_op.drop_column('location_id')
+        for name, columns in desc_indexes.items():
+            op.create_index(name, 'item', columns, unique=False)
+    else:
+        op.drop_constraint('fk_item_location_id_location', 'item', type_='foreignkey')
+        op.drop_column('item', 'location_id')
+
+    with op.batch_alter_table('location_closure', schema=None) as batch_op:
+        batch_op.drop_index('ix_location_closure_descendant_id')
+
+    op.drop_table('location_closure')
+    op.drop_table('location_alias')
+    op.drop_table('location')
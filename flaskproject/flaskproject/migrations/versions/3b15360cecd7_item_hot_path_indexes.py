@@ -0,0 +1,37 @@
+"""item hot-path indexes
+
+Revision ID: 3b15360cecd7
+Revises: c6cf902fa0fa
+Create Date: 2026-10-18 12:32:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3b15360cecd7'
+down_revision = 'c6cf902fa0fa'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('item', schema=None) as batch_op:
+        batch_op.create_index('ix_item_date_posted', [sa.literal_column('date_posted DESC'), sa.literal_column('id DESC')], unique=False)
+        batch_op.create_index('ix_item_category_date_posted', ['category', sa.literal_column('date_posted DESC')], unique=False)
+        batch_op.create_index('ix_item_user_id_date_posted', ['user_id', sa.literal_column('date_posted DESC')], unique=False)
+        batch_op.create_index('ix_item_status_date_posted', ['status', 'date_posted'], unique=False)
+        batch_op.create_index('ix_item_updated_at', ['updated_at', 'id'], unique=False)
+    # Give the planner row estimates for the new indexes
+    if op.get_bind().dialect.name == 'sqlite':
+        op.execute("ANALYZE item")
+
+
+def downgrade():
+    with op.batch_alter_table('item', schema=None) as batch_op:
+        batch_op.drop_index('ix_item_updated_at')
+        batch_op.drop_index('ix_item_status_date_posted')
+        batch_op.drop_index('ix_item_user_id_date_posted')
+        batch_op.drop_index('ix_item_category_date_posted')
+        batch_op.drop_index('ix_item_date_posted')
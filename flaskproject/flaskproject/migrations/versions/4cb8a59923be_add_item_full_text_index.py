@@ -0,0 +1,36 @@
+"""add item full-text index
+
+Revision ID: 4cb8a59923be
+Revises: 3b15360cecd7
+Create Date: 2026-10-18 12:33:00.000000
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = '4cb8a59923be'
+down_revision = '3b15360cecd7'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # FTS5 is SQLite-only; other databases fall back to LIKE search
+    if op.get_bind().dialect.name != 'sqlite':
+        return
+    op.execute(
+        "CREATE VIRTUAL TABLE IF NOT EXISTS item_fts "
+        "USING fts5(title, description, location, tokenize='porter unicode61')"
+    )
+    op.execute("DELETE FROM item_fts")
+    op.execute(
+        "INSERT INTO item_fts(rowid, title, description, location) "
+        "SELECT id, title, description, location FROM item"
+    )
+
+
+def downgrade():
+    if op.get_bind().dialect.name != 'sqlite':
+        return
+    op.execute("DROP TABLE IF EXISTS item_fts")
@@ -0,0 +1,35 @@
+"""upload blobs
+
+Revision ID: 5a7c0e3d91f2
+Revises: 9e2f61b7a4d0
+Create Date: 2026-10-18 12:50:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5a7c0e3d91f2'
+down_revision = '9e2f61b7a4d0'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('blob',
+    sa.Column('filename', sa.String(length=255), nullable=False),
+    sa.Column('refcount', sa.Integer(), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('filename')
+    )
+    # Existing uploads keep their names; they are reference-counted from now on
+    op.execute(
+        "INSERT INTO blob (filename, refcount, created_at) "
+        "SELECT image_filename, count(*), CURRENT_TIMESTAMP FROM item "
+        "WHERE image_filename IS NOT NULL GROUP BY image_filename"
+    )
+
+
+def downgrade():
+    op.drop_table('blob')
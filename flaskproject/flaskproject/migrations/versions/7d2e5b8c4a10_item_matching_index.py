@@ -0,0 +1,46 @@
+"""item matching index
+
+Revision ID: 7d2e5b8c4a10
+Revises: 5a7c0e3d91f2
+Create Date: 2026-10-18 13:40:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '7d2e5b8c4a10'
+down_revision = '5a7c0e3d91f2'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('item_term',
+    sa.Column('term', sa.String(length=120), nullable=False),
+    sa.Column('item_id', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['item_id'], ['item.id'], ),
+    sa.PrimaryKeyConstraint('term', 'item_id')
+    )
+    with op.batch_alter_table('item_term', schema=None) as batch_op:
+        batch_op.create_index('ix_item_term_item_id', ['item_id'], unique=False)
+
+    op.create_table('item_match',
+    sa.Column('item_id', sa.Integer(), nullable=False),
+    sa.Column('match_id', sa.Integer(), nullable=False),
+    sa.Column('score', sa.Float(), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['item_id'], ['item.id'], ),
+    sa.ForeignKeyConstraint(['match_id'], ['item.id'], ),
+    sa.PrimaryKeyConstraint('item_id', 'match_id')
+    )
+    # Existing items are indexed and matched by `flask rebuild-matches`
+
+
+def downgrade():
+    op.drop_table('item_match')
+    with op.batch_alter_table('item_term', schema=None) as batch_op:
+        batch_op.drop_index('ix_item_term_item_id')
+
+    op.drop_table('item_term')
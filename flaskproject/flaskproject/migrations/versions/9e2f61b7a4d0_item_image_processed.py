@@ -0,0 +1,28 @@
+"""item image_processed
+
+Revision ID: 9e2f61b7a4d0
+Revises: 4cb8a59923be
+Create Date: 2026-10-18 12:40:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '9e2f61b7a4d0'
+down_revision = '4cb8a59923be'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('item', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('image_processed', sa.Boolean(), nullable=True))
+    # Existing uploads get their variants from `flask process-images`
+    op.execute("UPDATE item SET image_processed = 0")
+
+
+def downgrade():
+    with op.batch_alter_table('item', schema=None) as batch_op:
+        batch_op.drop_column('image_processed')
@@ -0,0 +1,28 @@
+"""collection version
+
+Revision ID: a8e5c2f7d316
+Revises: f1d4b6a8c093
+Create Date: 2026-10-18 15:30:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a8e5c2f7d316'
+down_revision = 'f1d4b6a8c093'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('collection_version',
+    sa.Column('name', sa.String(length=50), nullable=False),
+    sa.Column('version', sa.Integer(), nullable=False),
+    sa.PrimaryKeyConstraint('name')
+    )
+
+
+def downgrade():
+    op.drop_table('collection_version')
@@ -0,0 +1,28 @@
+"""item full image variant
+
+Revision ID: b2c7f4e9a061
+Revises: d9b3e6a1c548
+Create Date: 2026-10-18 15:50:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b2c7f4e9a061'
+down_revision = 'd9b3e6a1c548'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Processed items are served through their metadata-free "_full" copy, which earlier
+    # processing didn't write: serve the originals until `flask process-images` has run
+    op.execute(sa.text("UPDATE item SET image_processed = :false WHERE image_processed = :true").bindparams(
+        false=False, true=True
+    ))
+
+
+def downgrade():
+    pass
@@ -0,0 +1,27 @@
+"""item image_hash
+
+Revision ID: b4f81c2d6e93
+Revises: 7d2e5b8c4a10
+Create Date: 2026-10-18 14:10:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b4f81c2d6e93'
+down_revision = '7d2e5b8c4a10'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('item', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('image_hash', sa.String(length=16), nullable=True))
+    # Existing photos are hashed by `flask rehash-images`
+
+
+def downgrade():
+    with op.batch_alter_table('item', schema=None) as batch_op:
+        batch_op.drop_column('image_hash')
@@ -0,0 +1,40 @@
+"""item updated_at and tombstones
+
+Revision ID: c6cf902fa0fa
+Revises: 8d9441043f9f
+Create Date: 2026-10-18 12:31:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c6cf902fa0fa'
+down_revision = '8d9441043f9f'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Databases created by db.create_all() after updated_at was added already have it
+    columns = {column['name'] for column in sa.inspect(op.get_bind()).get_columns('item')}
+    if 'updated_at' not in columns:
+        with op.batch_alter_table('item', schema=None) as batch_op:
+            batch_op.add_column(sa.Column('updated_at', sa.DateTime(), nullable=True))
+    # Delta sync orders by updated_at alone, so older rows start from their post date
+    op.execute("UPDATE item SET updated_at = date_posted WHERE updated_at IS NULL")
+
+    if not sa.inspect(op.get_bind()).has_table('item_tombstone'):
+        op.create_table('item_tombstone',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('item_id', sa.Integer(), nullable=False),
+        sa.Column('deleted_at', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('id')
+        )
+
+
+def downgrade():
+    op.drop_table('item_tombstone')
+    with op.batch_alter_table('item', schema=None) as batch_op:
+        batch_op.drop_column('updated_at')
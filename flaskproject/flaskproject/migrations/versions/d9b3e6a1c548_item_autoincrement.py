@@ -0,0 +1,53 @@
+"""item autoincrement
+
+Revision ID: d9b3e6a1c548
+Revises: a8e5c2f7d316
+Create Date: 2026-10-18 15:40:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd9b3e6a1c548'
+down_revision = 'a8e5c2f7d316'
+branch_labels = None
+depends_on = None
+
+
+# The batch copy can't carry the DESC expression indexes over, so they are rebuilt around it
+DESC_INDEXES = {
+    'ix_item_date_posted': [sa.literal_column('date_posted DESC'), sa.literal_column('id DESC')],
+    'ix_item_category_date_posted': ['category', sa.literal_column('date_posted DESC')],
+    'ix_item_user_id_date_posted': ['user_id', sa.literal_column('date_posted DESC')],
+    'ix_item_location_id_date_posted': ['location_id', sa.literal_column('date_posted DESC')],
+}
+
+
+def _recreate_item(autoincrement):
+    for name in DESC_INDEXES:
+        op.drop_index(name, table_name='item')
+    with op.batch_alter_table('item', schema=None, recreate='always',
+                              table_kwargs={'sqlite_autoincrement': autoincrement}):
+        pass
+    for name, columns in DESC_INDEXES.items():
+        op.create_index(name, 'item', columns, unique=False)
+
+
+def upgrade():
+    # Only SQLite reuses the highest rowid; other databases never hand out a key twice
+    if op.get_bind().dialect.name != 'sqlite':
+        return
+    _recreate_item(True)
+    # Ids already deleted past the highest live one must not come back either
+    op.execute("DELETE FROM sqlite_sequence WHERE name = 'item'")
+    op.execute(
+        "INSERT INTO sqlite_sequence (name, seq) SELECT 'item', coalesce(max(id), 0) "
+        "FROM (SELECT id FROM item UNION ALL SELECT item_id FROM item_tombstone)"
+    )
+
+def downgrade():
+    if op.get_bind().dialect.name != 'sqlite':
+        return
+    _recreate_item(False)
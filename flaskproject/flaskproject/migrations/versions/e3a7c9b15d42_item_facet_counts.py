@@ -0,0 +1,34 @@
+"""item facet counts
+
+Revision ID: e3a7c9b15d42
+Revises: 0c6a9d3f1e27
+Create Date: 2026-10-18 15:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e3a7c9b15d42'
+down_revision = '0c6a9d3f1e27'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('item_facet',
+    sa.Column('category', sa.String(length=50), nullable=False),
+    sa.Column('status', sa.String(length=20), nullable=False),
+    sa.Column('count', sa.Integer(), nullable=False),
+    sa.PrimaryKeyConstraint('category', 'status')
+    )
+    op.execute(
+        "INSERT INTO item_facet (category, status, count) "
+        "SELECT COALESCE(category, ''), COALESCE(status, ''), count(*) FROM item "
+        "GROUP BY COALESCE(category, ''), COALESCE(status, '')"
+    )
+
+
+def downgrade():
+    op.drop_table('item_facet')
@@ -0,0 +1,40 @@
+"""lost report registry
+
+Revision ID: f1d4b6a8c093
+Revises: e3a7c9b15d42
+Create Date: 2026-10-18 15:20:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f1d4b6a8c093'
+down_revision = 'e3a7c9b15d42'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('lost_report',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('category', sa.String(length=50), nullable=False),
+    sa.Column('item_name', sa.String(length=100), nullable=False),
+    sa.Column('location', sa.String(length=100), nullable=True),
+    sa.Column('date_lost', sa.String(length=50), nullable=True),
+    sa.Column('description', sa.Text(), nullable=True),
+    sa.Column('contact', sa.String(length=120), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('id'),
+    sqlite_autoincrement=True
+    )
+    with op.batch_alter_table('lost_report', schema=None) as batch_op:
+        batch_op.create_index('ix_lost_report_category_id', ['category', 'id'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('lost_report', schema=None) as batch_op:
+        batch_op.drop_index('ix_lost_report_category_id')
+
+    op.drop_table('lost_report')
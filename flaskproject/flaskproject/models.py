@@ -15,21 +15,131 @@ class User(UserMixin, db.Model):
     # Relationship to Item
     items = db.relationship('Item', backref='user', lazy=True)
 
+# AUTOINCREMENT so a deleted item's id is never handed out again: tombstones and
+# item_fts rows are keyed by it
 class Item(db.Model):
+    __table_args__ = {'sqlite_autoincrement': True}
+
     id = db.Column(db.Integer, primary_key=True)
     title = db.Column(db.String(100), nullable=False)
     description = db.Column(db.Text)
     category = db.Column(db.String(50))
     location = db.Column(db.String(100))
     date_posted = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     status = db.Column(db.String(20), default='lost')  # Possible: 'lost', 'found', 'returned'
     image_filename = db.Column(db.String(255))
+    image_processed = db.Column(db.Boolean, default=False)  # variants written by images.ImagePipeline
+    image_hash = db.Column(db.String(16))  # 64-bit dHash of the photo, hex (see image_index.py)
+    location_id = db.Column(db.Integer, db.ForeignKey('location.id'))  # Item.location resolved through the gazetteer
     views = db.Column(db.Integer, default=0)
     
     # Foreign key
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'))
 
 
+# Indexes matching the hot query shapes (checked by `flask check-query-plans`)
+# home, /all-complaints keyset pages
+db.Index('ix_item_date_posted', Item.date_posted.desc(), Item.id.desc())
+# category_page
+db.Index('ix_item_category_date_posted', Item.category, Item.date_posted.desc())
+# profile
+db.Index('ix_item_user_id_date_posted', Item.user_id, Item.date_posted.desc())
+# search by status
+db.Index('ix_item_status_date_posted', Item.status, Item.date_posted)
+# delta sync
+db.Index('ix_item_updated_at', Item.updated_at, Item.id)
+# ?location= filters (locations.py)
+db.Index('ix_item_location_id_date_posted', Item.location_id, Item.date_posted.desc())
+
+
+# Gazetteer of campus places, building > floor > room (see locations.py)
+class Location(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(100), nullable=False)
+    kind = db.Column(db.String(20), nullable=False)  # 'building', 'floor' or 'room'
+    parent_id = db.Column(db.Integer, db.ForeignKey('location.id'))
+    slug = db.Column(db.String(255), unique=True, nullable=False)  # e.g. "library/2nd-floor"
+
+
+# Normalized spellings that resolve to a location ("library 2nd floor", "lib l2")
+class LocationAlias(db.Model):
+    alias = db.Column(db.String(255), primary_key=True)
+    location_id = db.Column(db.Integer, db.ForeignKey('location.id'), nullable=False)
+
+
+# Transitive closure of the gazetteer: one row per (ancestor, descendant), itself included at depth 0
+class LocationClosure(db.Model):
+    ancestor_id = db.Column(db.Integer, db.ForeignKey('location.id'), primary_key=True)
+    descendant_id = db.Column(db.Integer, db.ForeignKey('location.id'), primary_key=True)
+    depth = db.Column(db.Integer, nullable=False)
+
+
+db.Index('ix_location_closure_descendant_id', LocationClosure.descendant_id)
+
+
+# Materialized item counts per (category, status), kept by facets.py; '' stands for a missing value
+class ItemFacet(db.Model):
+    category = db.Column(db.String(50), primary_key=True)
+    status = db.Column(db.String(20), primary_key=True)
+    count = db.Column(db.Integer, nullable=False, default=0)
+
+
+# Bumped by every write to a collection ('items'), kept by etag.py; list ETags are built from it
+class CollectionVersion(db.Model):
+    name = db.Column(db.String(50), primary_key=True)
+    version = db.Column(db.Integer, nullable=False, default=0)
+
+
+# Content-addressed upload (see storage.py); refcount = items whose image_filename is this file
+class Blob(db.Model):
+    filename = db.Column(db.String(255), primary_key=True)
+    refcount = db.Column(db.Integer, nullable=False, default=0)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+
+# Inverted index for lost/found matching (see matching.py): one row per term of each item
+class ItemTerm(db.Model):
+    term = db.Column(db.String(120), primary_key=True)
+    item_id = db.Column(db.Integer, db.ForeignKey('item.id'), primary_key=True)
+
+
+db.Index('ix_item_term_item_id', ItemTerm.item_id)
+
+
+# Best match candidates of each item (top MATCH_TOP_K), highest score first
+class ItemMatch(db.Model):
+    item_id = db.Column(db.Integer, db.ForeignKey('item.id'), primary_key=True)
+    match_id = db.Column(db.Integer, db.ForeignKey('item.id'), primary_key=True)
+    score = db.Column(db.Float, nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+
+# Deletion log for delta sync: one row per deleted Item, in deletion order
+class ItemTombstone(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    item_id = db.Column(db.Integer, nullable=False)
+    deleted_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+
+# Reports filed through the per-category "lost" forms (see lost_registry.py).
+# AUTOINCREMENT so a deleted report's id is never handed out again.
+class LostReport(db.Model):
+    __table_args__ = {'sqlite_autoincrement': True}
+
+    id = db.Column(db.Integer, primary_key=True)
+    category = db.Column(db.String(50), nullable=False)
+    item_name = db.Column(db.String(100), nullable=False)
+    location = db.Column(db.String(100))
+    date_lost = db.Column(db.String(50))
+    description = db.Column(db.Text)
+    contact = db.Column(db.String(120))
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+
+db.Index('ix_lost_report_category_id', LostReport.category, LostReport.id)
+
+
 class Complaint(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     title = db.Column(db.String(100), nullable=False)
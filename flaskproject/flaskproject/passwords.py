@@ -0,0 +1,166 @@
+import atexit
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, TimeoutError
+from werkzeug.security import generate_password_hash, check_password_hash
+
+
+class HasherBusy(Exception):
+    """Raised instead of hashing when the executor can't take the work in time.
+
+    status is 429 when the queue is full (rejected up front) and 503 when the
+    caller gave up waiting; retry_after is a hint in seconds for the client.
+    """
+
+    def __init__(self, message, status, retry_after=1):
+        super().__init__(message)
+        self.message = message
+        self.status = status
+        self.retry_after = retry_after
+
+
+class PasswordHasher:
+    """Runs password hashing on a small, bounded pool of threads.
+
+    Hashing is deliberately slow, so a burst of logins would otherwise occupy
+    every request worker. At most PASSWORD_WORKERS hashes run at once and at
+    most PASSWORD_QUEUE_LIMIT more may wait; anything beyond that fails fast
+    with HasherBusy. hashlib releases the GIL while deriving keys, so threads
+    give real parallelism.
+    """
+
+    def __init__(self, app=None):
+        self.app = None
+        self._executor = None
+        self._slots = None
+        self._method_prefix = None
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('PASSWORD_HASH_METHOD', 'pbkdf2:sha256')
+        app.config.setdefault('PASSWORD_SALT_LENGTH', 16)
+        app.config.setdefault('PASSWORD_WORKERS', 2)
+        app.config.setdefault('PASSWORD_QUEUE_LIMIT', 16)
+        app.config.setdefault('PASSWORD_WAIT_TIMEOUT', 5.0)
+        self.app = app
+        self._slots = threading.BoundedSemaphore(
+            app.config['PASSWORD_WORKERS'] + app.config['PASSWORD_QUEUE_LIMIT']
+        )
+        atexit.register(self.shutdown)
+
+    def hash(self, password):
+        config = self.app.config
+        return self._run(
+            generate_password_hash, password, config['PASSWORD_HASH_METHOD'], config['PASSWORD_SALT_LENGTH']
+        )
+
+    def verify(self, password_hash, password):
+        if not password_hash or password is None:
+            return False
+        return self._run(check_password_hash, password_hash, password)
+
+    def needs_rehash(self, password_hash):
+        # Stored hashes start with their full method ("pbkdf2:sha256:260000$salt$hash")
+        return password_hash.split('$', 1)[0] != self._configured_prefix()
+
+    def verify_and_update(self, user, password):
+        """Check password against user.password_hash, rehashing it if the method changed.
+
+        The new hash is only assigned; the caller commits. A busy executor
+        skips the rehash rather than failing the login, it happens next time.
+        """
+        if not self.verify(user.password_hash, password):
+            return False
+        if self.needs_rehash(user.password_hash):
+            try:
+                user.password_hash = self.hash(password)
+            except HasherBusy:
+                pass
+        return True
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+
+    def _configured_prefix(self):
+        # Whatever werkzeug expands the configured method to, e.g. the default iteration count
+        if self._method_prefix is None:
+            sample = generate_password_hash('', self.app.config['PASSWORD_HASH_METHOD'], 1)
+            self._method_prefix = sample.split('$', 1)[0]
+        return self._method_prefix
+
+    def _run(self, fn, *args):
+        if not self._slots.acquire(blocking=False):
+            raise HasherBusy("Too many sign-in attempts in progress, try again shortly", 429)
+        try:
+            future = self._ensure_executor().submit(fn, *args)
+        except Exception:
+            self._slots.release()
+            raise
+        # The slot is held until the hash finishes, even if the caller stops waiting
+        future.add_done_callback(lambda _: self._slots.release())
+        try:
+            return future.result(timeout=self.app.config['PASSWORD_WAIT_TIMEOUT'])
+        except TimeoutError:
+            raise HasherBusy("Sign-in is taking too long, try again shortly", 503)
+
+    def _ensure_executor(self):
+        # Created lazily so each forked worker process gets its own threads
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.app.config['PASSWORD_WORKERS'], thread_name_prefix='password-hasher'
+                )
+            return self._executor
+
+
+def _hash_one(args):
+    password, method, salt_length = args
+    return generate_password_hash(password, method, salt_length)
+
+
+class HashPool:
+    """A process pool for hashing many passwords at once (bulk provisioning).
+
+    Unlike PasswordHasher this isn't bounded by the request workers: it is
+    meant for offline batches that should use every core. Workers are spawned
+    rather than forked, since the parent has threads running, so the main
+    module must be safe to import (the flask CLI and WSGI servers are).
+
+        with HashPool(processes=4) as pool:
+            hashes = pool.hash_all(passwords, 'pbkdf2:sha256', 16)
+    """
+
+    def __init__(self, processes=None):
+        self.processes = processes or os.cpu_count() or 1
+        self._executor = None
+
+    def hash_all(self, passwords, method, salt_length=16):
+        passwords = list(passwords)
+        if not passwords:
+            return []
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.processes, mp_context=multiprocessing.get_context('spawn')
+            )
+        chunksize = max(1, len(passwords) // (self.processes * 4))
+        return list(self._executor.map(
+            _hash_one, ((password, method, salt_length) for password in passwords), chunksize=chunksize
+        ))
+
+    def close(self):
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+password_hasher = PasswordHasher()
@@ -0,0 +1,49 @@
+from datetime import datetime
+from sqlalchemy import select, text
+from sqlalchemy.dialects import sqlite
+from models import db, Item, LocationClosure
+
+
+# Representative statements for the hot read paths, shaped like the routes issue them
+def hot_queries():
+    now = datetime.utcnow()
+    return {
+        "home / all-complaints": select(Item).order_by(Item.date_posted.desc(), Item.id.desc()).limit(50),
+        "category_page": select(Item).where(Item.category == 'electronics').order_by(Item.date_posted.desc()),
+        "profile": select(Item).where(Item.user_id == 1).order_by(Item.date_posted.desc()),
+        "search by status": select(Item).where(Item.status == 'lost').order_by(Item.date_posted.desc()).limit(20),
+        "delta sync": select(Item).where(Item.updated_at > now).order_by(Item.updated_at, Item.id).limit(50),
+        "?location= filter": select(Item).where(Item.location_id.in_(
+            select(LocationClosure.descendant_id).where(LocationClosure.ancestor_id == 1)
+        )).order_by(Item.date_posted.desc()).limit(50),
+    }
+
+
+def explain(stmt):
+    sql = str(stmt.compile(dialect=sqlite.dialect(), compile_kwargs={"literal_binds": True}))
+    rows = db.session.execute(text(f"EXPLAIN QUERY PLAN {sql}")).all()
+    return [row[-1] for row in rows]
+
+
+def is_full_scan(detail):
+    # "SCAN item" without "USING ... INDEX" reads every row of the table
+    return detail.startswith('SCAN item') and 'INDEX' not in detail
+
+
+def report():
+    """Print each hot query's plan; return False if any of them scans the whole item table."""
+    if db.engine.dialect.name != 'sqlite':
+        print("Query plan check only supports SQLite")
+        return True
+
+    ok = True
+    for name, stmt in hot_queries().items():
+        plan = explain(stmt)
+        scans = [detail for detail in plan if is_full_scan(detail)]
+        sorts = [detail for detail in plan if 'TEMP B-TREE' in detail]
+        status = 'FULL SCAN' if scans else ('SORT' if sorts else 'ok')
+        ok = ok and not scans
+        print(f"[{status}] {name}")
+        for detail in plan:
+            print(f"    {detail}")
+    return ok
@@ -1,12 +1,26 @@
-import os
-from flask import request, jsonify, current_app
+import base64
+from flask import request, jsonify, current_app, Response, stream_with_context
 from flask_restful import Resource
-from werkzeug.security import generate_password_hash, check_password_hash
 from flask_jwt_extended import create_access_token, jwt_required, get_jwt_identity
-from models import db, User, Item, Complaint
+from models import db, User, Item, ItemMatch, Complaint
+import search_index
+from cache import response_cache, item_key, ITEMS
+import sync
+import bulk
+from images import image_pipeline, variant_urls, public_filename
+import storage
+import resumable
+import stream_upload
+import matching
+import locations
+import facets
+from autocomplete import autocomplete, FIELDS as AUTOCOMPLETE_FIELDS
+from image_index import image_index, hamming
+from passwords import password_hasher, HasherBusy
+from export import EXPORT_FORMATS, export_stream
+from etag import make_etag, collection_version, item_version, not_modified, with_etag
 from datetime import datetime
-from werkzeug.utils import secure_filename
-from flask import current_app
+from sqlalchemy import and_, or_
 
 
 # Define upload folder and allowed extensions
@@ -17,6 +31,10 @@ ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif'}
 def allowed_file(filename):
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
+def hasher_busy(exc):
+    return {"message": exc.message}, exc.status, {"Retry-After": str(exc.retry_after)}
+
+
 # User Registration
 class RegisterResource(Resource):
     def post(self):
@@ -28,7 +46,10 @@ class RegisterResource(Resource):
         if User.query.filter_by(username=username).first() or User.query.filter_by(email=email).first():
             return {"message": "Username or email already exists"}, 409
 
-        hashed_password = generate_password_hash(password)
+        try:
+            hashed_password = password_hasher.hash(password)
+        except HasherBusy as exc:
+            return hasher_busy(exc)
         new_user = User(username=username, email=email, password_hash=hashed_password)
         db.session.add(new_user)
         db.session.commit()
@@ -36,7 +57,6 @@ class RegisterResource(Resource):
         return {"message": "User registered successfully"}, 201
 
 
-# User Login
 # User Login
 class LoginResource(Resource):
     def post(self):
@@ -45,36 +65,119 @@ class LoginResource(Resource):
         password = data.get("password")
 
         user = User.query.filter_by(username=username).first()
-        if not user or not check_password_hash(user.password_hash, password):
-            return {"message": "Invalid username or password"}, 401
+        try:
+            if not user or not password_hasher.verify_and_update(user, password):
+                return {"message": "Invalid username or password"}, 401
+        except HasherBusy as exc:
+            return hasher_busy(exc)
+        # Saves a rehashed password if the hash method changed
+        db.session.commit()
 
         access_token = create_access_token(identity=str(user.id))
 
         return {"access_token": access_token, "role": user.role}, 200
 
 
-# Get All Complaints
+# Keyset pagination cursors: "<date_posted iso>|<id>" in urlsafe base64
+def encode_cursor(date_posted, item_id):
+    raw = f"{date_posted.isoformat()}|{item_id}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+def decode_cursor(cursor):
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        date_part, id_part = base64.urlsafe_b64decode(padded).decode().split("|", 1)
+        return datetime.fromisoformat(date_part), int(id_part)
+    except (ValueError, UnicodeDecodeError):
+        return None
+
+
+def serialize_item(item, username):
+    # Return full image URL if image exists: the metadata-free copy once the image worker has written it
+    image_url = None
+    if item.image_filename:
+        image_url = f"{request.host_url}static/uploads/{public_filename(item.image_filename, item.image_processed)}"
+    # Resized variants for list views, once the image worker has written them
+    variants = None
+    if item.image_filename and item.image_processed:
+        variants = variant_urls(item.image_filename, f"{request.host_url}static/uploads/")
+    return {
+        "id": item.id,
+        "title": item.title,
+        "description": item.description,
+        "category": item.category,
+        "location": item.location,
+        "location_id": item.location_id,
+        "status": item.status,
+        "image_filename": image_url,
+        "image_variants": variants,
+        "views": item.views,
+        "date_posted": item.date_posted.isoformat(),
+        "user_id": item.user_id,
+        "username": username
+    }
+
+
+def build_complaints_page(limit, cursor, location=None):
+    # Join the owner's username in the same query instead of lazy-loading item.user per row
+    query = (
+        db.session.query(Item, User.username)
+        .outerjoin(User, Item.user_id == User.id)
+        .order_by(Item.date_posted.desc(), Item.id.desc())
+    )
+    if location:
+        query = locations.filter_items(query, location)
+
+    if cursor:
+        after_date, after_id = cursor
+        query = query.filter(or_(
+            Item.date_posted < after_date,
+            and_(Item.date_posted == after_date, Item.id < after_id)
+        ))
+
+    # Fetch one extra row to know whether another page exists
+    rows = query.limit(limit + 1).all()
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1][0]
+        next_cursor = encode_cursor(last.date_posted, last.id)
+
+    return {
+        "items": [serialize_item(item, username) for item, username in rows],
+        "next_cursor": next_cursor
+    }
+
+
+# Get All Complaints (newest first, paginated with ?limit=&after=)
 class AllComplaintsResource(Resource):
     def get(self):
-        items = Item.query.order_by(Item.date_posted.desc()).all()
-        result = []
-        for item in items:
-            # Return full image URL if image exists
-            image_url = f"{request.host_url}static/uploads/{item.image_filename}" if item.image_filename else None
-            result.append({
-                "id": item.id,
-                "title": item.title,
-                "description": item.description,
-                "category": item.category,
-                "location": item.location,
-                "status": item.status,
-                "image_filename": image_url,
-                "views": item.views,
-                "date_posted": item.date_posted.isoformat(),
-                "user_id": item.user_id,
-                "username": item.user.username
-            })
-        return jsonify(result)
+        default_limit = current_app.config.get('COMPLAINTS_PAGE_SIZE', 50)
+        max_limit = current_app.config.get('COMPLAINTS_MAX_PAGE_SIZE', 200)
+        try:
+            limit = int(request.args.get("limit", default_limit))
+        except ValueError:
+            return {"message": "limit must be an integer"}, 400
+        limit = max(1, min(limit, max_limit))
+
+        after = request.args.get("after")
+        cursor = None
+        if after:
+            cursor = decode_cursor(after)
+            if cursor is None:
+                return {"message": "Invalid cursor"}, 400
+
+        location = request.args.get("location", "").strip()
+
+        # Image URLs embed the host, so it is part of the validator and cache key
+        etag = make_etag("items", collection_version(), request.host_url, limit, after, location)
+        cached = not_modified(etag)
+        if cached:
+            return cached
+
+        # Keying the cache on the etag also drops entries made stale by other workers' writes
+        payload = response_cache.get_or_set(ITEMS, etag, lambda: build_complaints_page(limit, cursor, location))
+        return with_etag(jsonify(payload), etag)
 
 
 
@@ -86,8 +189,11 @@ class AddComplaintResource(Resource):
 
         # Check if file is provided in the request
         image_filename = None
-        if 'image_filename' in data:
-            image_filename = data.get('image_filename')
+        if data.get('image_filename'):
+            # A file already sent through /uploads or /uploads/stream
+            image_filename = data['image_filename']
+            if not storage.is_stored(image_filename):
+                return {"message": "Unknown image_filename"}, 400
 
         item = Item(
             title=data.get("title"),
@@ -101,6 +207,9 @@ class AddComplaintResource(Resource):
         )
         db.session.add(item)
         db.session.commit()
+        response_cache.invalidate_item(item.id)
+        image_pipeline.submit(item.image_filename)
+        matching.refresh_matches(item)
 
         return {"message": "Complaint added successfully", "item_id": item.id}, 201
 
@@ -118,14 +227,10 @@ class DeleteComplaintResource(Resource):
         if complaint.user_id != current_user_id:
             return {"message": "You are not authorized to delete this complaint"}, 403
 
-        # Delete the image file if it exists
-        if complaint.image_filename:
-            image_path = os.path.join(current_app.config['UPLOAD_FOLDER'], complaint.image_filename)
-            if os.path.exists(image_path):
-                os.remove(image_path)
-
+        # The image file is freed after commit once no other item references it (storage.py)
         db.session.delete(complaint)
         db.session.commit()
+        response_cache.invalidate_item(complaint_id)
 
         return {"message": "Complaint deleted successfully"}, 200
 
@@ -151,11 +256,19 @@ class UpdateComplaintResource(Resource):
         file = request.files.get("image")  # Image file if uploaded
 
         # Update image if a new one is uploaded
+        new_image = None
         if file and allowed_file(file.filename):
-            filename = secure_filename(file.filename)
-            image_path = os.path.join(current_app.config['UPLOAD_FOLDER'], filename)
-            file.save(image_path)
-            complaint.image_filename = filename
+            # Stored under its content hash, so equal names from different users can't collide
+            new_image = storage.save_upload(file)
+        elif data.get("image_filename"):
+            # A file already sent through the resumable /uploads API
+            new_image = data["image_filename"]
+            if not storage.is_stored(new_image):
+                return {"message": "Unknown image_filename"}, 400
+        if new_image and new_image != complaint.image_filename:
+            complaint.image_filename = new_image
+            complaint.image_processed = False
+            complaint.image_hash = None
 
         # Update other complaint fields from form data (if provided)
         complaint.title = data.get("title", complaint.title)
@@ -165,6 +278,10 @@ class UpdateComplaintResource(Resource):
         complaint.status = data.get("status", complaint.status)
 
         db.session.commit()
+        response_cache.invalidate_item(complaint.id)
+        if new_image:
+            image_pipeline.submit(complaint.image_filename)
+        matching.refresh_matches(complaint)
 
         # Return the full image URL if available
         image_url = f"{request.host_url}static/uploads/{complaint.image_filename}" if complaint.image_filename else None
@@ -178,22 +295,319 @@ class UpdateComplaintResource(Resource):
 class SingleComplaintResource(Resource):
     @jwt_required()
     def get(self, complaint_id):
-        complaint = Item.query.get(complaint_id)
-        if not complaint:
+        version = item_version(complaint_id)
+        if version is None:
             return {"message": "Complaint not found"}, 404
 
-        image_url = f"{request.host_url}static/uploads/{complaint.image_filename}" if complaint.image_filename else None
+        etag = make_etag("item", complaint_id, version, request.host_url)
+        cached = not_modified(etag)
+        if cached:
+            return cached
+
+        def build():
+            complaint = Item.query.get(complaint_id)
+            return serialize_item(complaint, complaint.user.username)
+
+        payload = response_cache.get_or_set(item_key(complaint_id), etag, build)
+        return with_etag(jsonify(payload), etag)
+
+
+
+# Likely counterparts of a lost or found item, best first (see matching.py)
+class ComplaintMatchesResource(Resource):
+    @jwt_required()
+    def get(self, complaint_id):
+        if not Item.query.get(complaint_id):
+            return {"message": "Complaint not found"}, 404
+
+        rows = (
+            db.session.query(ItemMatch.score, Item, User.username)
+            .join(Item, Item.id == ItemMatch.match_id)
+            .outerjoin(User, Item.user_id == User.id)
+            .filter(ItemMatch.item_id == complaint_id)
+            .order_by(ItemMatch.score.desc(), ItemMatch.match_id.desc())
+            .all()
+        )
+        return jsonify({
+            "item_id": complaint_id,
+            "matches": [{"score": score, "item": serialize_item(item, username)} for score, item, username in rows]
+        })
+
+
+# Items whose photo looks like this item's photo (Hamming distance of the dHashes), closest first
+class SimilarImagesResource(Resource):
+    @jwt_required()
+    def get(self, complaint_id):
+        item = Item.query.get(complaint_id)
+        if not item:
+            return {"message": "Complaint not found"}, 404
+        if not item.image_hash:
+            return {"message": "This complaint has no processed photo"}, 404
+
+        max_distance = min(
+            request.args.get("distance", current_app.config.get('IMAGE_MATCH_DISTANCE', 10), type=int), 32
+        )
+        limit = min(request.args.get("limit", 20, type=int), current_app.config.get('COMPLAINTS_MAX_PAGE_SIZE', 200))
+        candidates = [
+            item_id for _, item_id in image_index.similar(item.image_hash, max(max_distance, 0))
+            if item_id != complaint_id
+        ]
+        rows = (
+            db.session.query(Item, User.username)
+            .outerjoin(User, Item.user_id == User.id)
+            .filter(Item.id.in_(candidates[:limit]), Item.image_hash.isnot(None))
+            .all()
+        )
+        # The index may be a little stale: re-check each distance against the stored hash
+        similar = []
+        for other, username in rows:
+            distance = hamming(int(item.image_hash, 16), int(other.image_hash, 16))
+            if distance <= max_distance:
+                similar.append({"distance": distance, "item": serialize_item(other, username)})
+        similar.sort(key=lambda entry: (entry["distance"], -entry["item"]["id"]))
+        return jsonify({"item_id": complaint_id, "max_distance": max_distance, "similar": similar})
+
+
+# Full-text search (JSON variant of the /search page)
+class SearchResource(Resource):
+    def get(self):
+        q = request.args.get("q", "").strip()
+        category = request.args.get("category", "").strip().lower()
+        status = request.args.get("status", "").strip().lower()
+        location = request.args.get("location", "").strip()
+        page = request.args.get("page", 1, type=int)
+        per_page = min(request.args.get("per_page", current_app.config.get('SEARCH_PAGE_SIZE', 20), type=int),
+                       current_app.config.get('COMPLAINTS_MAX_PAGE_SIZE', 200))
+        if not q:
+            return {"message": "q is required"}, 400
+
+        query = db.session.query(Item, User.username).outerjoin(User, Item.user_id == User.id)
+        if category:
+            query = query.filter(Item.category == category)
+        if status:
+            query = query.filter(Item.status == status)
+        if location:
+            query = locations.filter_items(query, location)
+        query = search_index.apply_search(query, q)
+
+        total = query.order_by(None).count()
+        rows = query.limit(per_page).offset((max(page, 1) - 1) * per_page).all()
+
+        return jsonify({
+            "items": [serialize_item(item, username) for item, username in rows],
+            "page": page,
+            "per_page": per_page,
+            "total": total
+        })
+
+
+
+# "N lost / M found" per category, from the materialized counters
+class FacetsResource(Resource):
+    def get(self):
+        counts = facets.counts()
+        totals = {}
+        for by_status in counts.values():
+            for status, count in by_status.items():
+                totals[status] = totals.get(status, 0) + count
+        return {"categories": counts, "totals": totals}, 200
+
+
+# Suggestions for the search and new item forms, from the in-memory prefix index
+class AutocompleteResource(Resource):
+    def get(self):
+        field = request.args.get("field", "title")
+        if field not in AUTOCOMPLETE_FIELDS:
+            return {"message": f"field must be one of {', '.join(AUTOCOMPLETE_FIELDS)}"}, 400
+        q = request.args.get("q", "")
+        limit = max(1, min(request.args.get("limit", 10, type=int), 50))
+        return {"field": field, "q": q, "suggestions": autocomplete.suggest(field, q, limit)}, 200
+
+
+# Delta sync: items created/updated and ids deleted since a sync token
+class ComplaintChangesResource(Resource):
+    def get(self):
+        default_limit = current_app.config.get('COMPLAINTS_PAGE_SIZE', 50)
+        max_limit = current_app.config.get('COMPLAINTS_MAX_PAGE_SIZE', 200)
+        limit = max(1, min(request.args.get("limit", default_limit, type=int), max_limit))
 
+        since = request.args.get("since")
+        position = None
+        if since:
+            position = sync.decode_token(since)
+            if position is None:
+                return {"message": "Invalid sync token"}, 400
+
+        rows, deleted_ids, next_position, has_more = sync.changes_since(position, limit)
+
+        # Clients should apply "deleted" before "changes" and keep calling with
+        # the new token while has_more is true.
+        return jsonify({
+            "changes": [serialize_item(item, username) for item, username in rows],
+            "deleted": deleted_ids,
+            "sync_token": sync.encode_token(*next_position),
+            "has_more": has_more
+        })
+
+
+
+# Streaming bulk export of all items (NDJSON or CSV, optionally gzipped)
+class ExportItemsResource(Resource):
+    @jwt_required()
+    def get(self):
+        user = User.query.get(int(get_jwt_identity()))
+        if not user or user.role not in current_app.config.get('EXPORT_ROLES', ('admin', 'security')):
+            return {"message": "You are not authorized to export items"}, 403
+
+        fmt = request.args.get("format", "ndjson")
+        if fmt not in EXPORT_FORMATS:
+            return {"message": f"format must be one of {', '.join(EXPORT_FORMATS)}"}, 400
+        gzip = request.args.get("gzip", "").lower() in ("1", "true", "yes")
+
+        filename = f"items-{datetime.utcnow().strftime('%Y%m%d%H%M%S')}.{fmt}"
+        if gzip:
+            filename += ".gz"
+        stream = export_stream(fmt, gzip, current_app.config.get('EXPORT_BATCH_SIZE', 1000))
+        return Response(
+            stream_with_context(stream),
+            mimetype="application/gzip" if gzip else EXPORT_FORMATS[fmt],
+            headers={"Content-Disposition": f"attachment; filename={filename}"}
+        )
+
+
+
+# Bulk ingest: JSON array or CSV body, inserted in chunked transactions
+class BulkAddComplaintsResource(Resource):
+    @jwt_required()
+    def post(self):
+        current_user_id = int(get_jwt_identity())
+        try:
+            rows = bulk.read_rows(request.stream, request.content_type)
+            results = bulk.ingest_items(
+                rows, current_user_id,
+                chunk_size=current_app.config.get('BULK_CHUNK_SIZE', 500),
+                max_rows=current_app.config.get('BULK_MAX_ROWS', 10000)
+            )
+        except (ValueError, UnicodeDecodeError) as exc:
+            return {"message": f"Invalid bulk payload: {exc}"}, 400
+
+        response_cache.bump(ITEMS)
+        return bulk.summarize(results), 200
+
+
+
+class BulkProvisionUsersResource(Resource):
+    @jwt_required()
+    def post(self):
+        user = User.query.get(int(get_jwt_identity()))
+        if not user or user.role not in current_app.config.get('PROVISION_ROLES', ('admin',)):
+            return {"message": "You are not authorized to provision users"}, 403
+        try:
+            rows = bulk.read_rows(request.stream, request.content_type)
+            results = bulk.provision_users(
+                rows,
+                current_app.config.get('PASSWORD_HASH_METHOD', 'pbkdf2:sha256'),
+                current_app.config.get('PASSWORD_SALT_LENGTH', 16),
+                chunk_size=current_app.config.get('BULK_CHUNK_SIZE', 500),
+                max_rows=current_app.config.get('BULK_MAX_ROWS', 10000),
+                processes=current_app.config.get('PROVISION_PROCESSES')
+            )
+        except (ValueError, UnicodeDecodeError) as exc:
+            return {"message": f"Invalid bulk payload: {exc}"}, 400
+        return bulk.summarize(results), 200
+
+
+# Resumable chunked uploads: POST /uploads, PATCH /uploads/<id> per chunk, POST /uploads/<id>/commit
+def upload_error(exc):
+    headers = {"Upload-Offset": str(exc.offset)} if exc.offset is not None else {}
+    return {"message": exc.message, "offset": exc.offset}, exc.status, headers
+
+
+class UploadsResource(Resource):
+    @jwt_required()
+    def post(self):
+        data = request.get_json() or {}
+        filename = data.get("filename") or ""
+        if not allowed_file(filename):
+            return {"message": "File type not allowed"}, 400
+        try:
+            upload_id = resumable.create(int(get_jwt_identity()), filename, data.get("size"), data.get("sha256"))
+        except resumable.UploadError as exc:
+            return upload_error(exc)
+        return {
+            "upload_id": upload_id,
+            "offset": 0,
+            "chunk_size": current_app.config.get('UPLOAD_CHUNK_MAX', 8 * 1024 * 1024)
+        }, 201, {"Upload-Offset": "0"}
+
+
+class UploadResource(Resource):
+    @jwt_required()
+    def get(self, upload_id):
+        try:
+            meta = resumable.load(upload_id, int(get_jwt_identity()))
+        except resumable.UploadError as exc:
+            return upload_error(exc)
+        return {"upload_id": upload_id, "offset": meta["offset"], "size": meta["size"]}, 200, \
+            {"Upload-Offset": str(meta["offset"])}
+
+    @jwt_required()
+    def patch(self, upload_id):
+        try:
+            offset = int(request.headers.get("Upload-Offset", ""))
+        except ValueError:
+            return {"message": "Upload-Offset header is required"}, 400
+        try:
+            new_offset = resumable.append(
+                upload_id, int(get_jwt_identity()), offset, request.stream,
+                request.headers.get("Upload-Checksum-SHA256")
+            )
+        except resumable.UploadError as exc:
+            return upload_error(exc)
+        return {"upload_id": upload_id, "offset": new_offset}, 200, {"Upload-Offset": str(new_offset)}
+
+    @jwt_required()
+    def delete(self, upload_id):
+        try:
+            resumable.abort(upload_id, int(get_jwt_identity()))
+        except resumable.UploadError as exc:
+            return upload_error(exc)
+        return {"message": "Upload aborted"}, 200
+
+
+class UploadCommitResource(Resource):
+    @jwt_required()
+    def post(self, upload_id):
+        try:
+            filename = resumable.commit(upload_id, int(get_jwt_identity()))
+        except resumable.UploadError as exc:
+            return upload_error(exc)
+        # Pass image_filename to /add-complaint or /complaints/<id>/update
+        return {
+            "image_filename": filename,
+            "image_url": f"{request.host_url}static/uploads/{filename}"
+        }, 201
+
+
+# One-shot upload of a multipart "image" field, streamed to storage as it arrives
+class StreamUploadResource(Resource):
+    @jwt_required()
+    def post(self):
+        if request.mimetype != "multipart/form-data":
+            return {"message": "Expected multipart/form-data"}, 415
+        # Without a length the WSGI input can't be read safely to its end
+        if request.content_length is None:
+            return {"message": "Content-Length is required"}, 411
+        max_size = current_app.config.get('UPLOAD_MAX_SIZE', 20 * 1024 * 1024)
+        if request.content_length > max_size + stream_upload.MAX_BUFFER:
+            return {"message": f"Uploads are limited to {max_size} bytes"}, 413
+        try:
+            filename = stream_upload.save_multipart(
+                request.stream, request.mimetype_params.get("boundary"), "image", allowed_file, max_size
+            )
+        except resumable.UploadError as exc:
+            return upload_error(exc)
         return {
-            "id": complaint.id,
-            "title": complaint.title,
-            "description": complaint.description,
-            "category": complaint.category,
-            "location": complaint.location,
-            "status": complaint.status,
-            "image_filename": image_url,
-            "views": complaint.views,
-            "date_posted": complaint.date_posted.isoformat(),
-            "user_id": complaint.user_id,
-            "username": complaint.user.username
-        }, 200
+            "image_filename": filename,
+            "image_url": f"{request.host_url}static/uploads/{filename}"
+        }, 201
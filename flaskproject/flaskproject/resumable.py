@@ -0,0 +1,170 @@
+import fcntl
+import hashlib
+import json
+import os
+import re
+import secrets
+import time
+from flask import current_app
+import storage
+
+
+# Resumable uploads: init -> append chunks at explicit offsets -> commit.
+# Each session is a "<id>.part" data file plus a "<id>.json" metadata file in
+# the uploads' .incoming folder, so any worker can continue any session and the
+# current offset is simply the size of the part file. Writers hold an exclusive
+# flock on the part file, so a retried chunk overlapping one still in flight (or
+# a commit during a write) is turned away with a 409 instead of interleaving.
+UPLOAD_ID_RE = re.compile(r'^[A-Za-z0-9_-]{16,64}$')
+READ_CHUNK_SIZE = 64 * 1024
+
+
+class UploadError(Exception):
+    def __init__(self, message, status=400, offset=None):
+        super().__init__(message)
+        self.message = message
+        self.status = status
+        self.offset = offset
+
+
+def _paths(upload_id):
+    if not UPLOAD_ID_RE.match(upload_id or ''):
+        raise UploadError("Upload not found", 404)
+    folder = storage.incoming_folder()
+    return os.path.join(folder, f"{upload_id}.part"), os.path.join(folder, f"{upload_id}.json")
+
+
+def _open_locked(part_path):
+    try:
+        f = open(part_path, 'r+b')
+    except FileNotFoundError:
+        raise UploadError("Upload not found", 404)
+    try:
+        fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except BlockingIOError:
+        f.close()
+        raise UploadError("Another request is writing to this upload", 409)
+    return f
+
+
+def create(user_id, filename, size, sha256=None):
+    max_size = current_app.config.get('UPLOAD_MAX_SIZE', 20 * 1024 * 1024)
+    if not isinstance(size, int) or size <= 0:
+        raise UploadError("size must be a positive integer")
+    if size > max_size:
+        raise UploadError(f"Uploads are limited to {max_size} bytes", 413)
+    if sha256 is not None and not re.fullmatch(r'[0-9a-fA-F]{64}', str(sha256)):
+        raise UploadError("sha256 must be a hex digest")
+
+    upload_id = secrets.token_urlsafe(18)
+    part_path, meta_path = _paths(upload_id)
+    meta = {
+        "user_id": user_id,
+        "ext": storage.normalize_extension(filename),
+        "size": size,
+        "sha256": sha256.lower() if sha256 else None,
+        "created": time.time()
+    }
+    with open(meta_path, 'w') as f:
+        json.dump(meta, f)
+    open(part_path, 'wb').close()
+    return upload_id
+
+
+def load(upload_id, user_id):
+    part_path, meta_path = _paths(upload_id)
+    try:
+        with open(meta_path) as f:
+            meta = json.load(f)
+    except FileNotFoundError:
+        raise UploadError("Upload not found", 404)
+    if meta["user_id"] != user_id:
+        raise UploadError("Upload not found", 404)
+    meta["offset"] = os.path.getsize(part_path) if os.path.exists(part_path) else 0
+    return meta
+
+
+def append(upload_id, user_id, offset, stream, chunk_sha256=None):
+    """Write one chunk read from stream at offset; returns the new offset.
+
+    The chunk is copied in small blocks, so memory stays bounded whatever the
+    chunk size. A chunk that fails its checksum is cut off again, leaving the
+    offset where it was so the client can resend just that chunk.
+    """
+    meta = load(upload_id, user_id)
+    part_path, _ = _paths(upload_id)
+    # Locked from the offset check through the last truncate
+    with _open_locked(part_path) as f:
+        current = os.fstat(f.fileno()).st_size
+        if offset != current:
+            raise UploadError("Offset does not match the uploaded size", 409, current)
+
+        max_chunk = current_app.config.get('UPLOAD_CHUNK_MAX', 8 * 1024 * 1024)
+        remaining = min(max_chunk, meta["size"] - offset)
+        digest = hashlib.sha256()
+        written = 0
+        f.seek(offset)
+        while True:
+            block = stream.read(min(READ_CHUNK_SIZE, remaining - written + 1))
+            if not block:
+                break
+            written += len(block)
+            if written > remaining:
+                f.truncate(offset)
+                raise UploadError("Chunk is larger than allowed or runs past the declared size", 413, offset)
+            digest.update(block)
+            f.write(block)
+        if chunk_sha256 and digest.hexdigest() != chunk_sha256.lower():
+            f.truncate(offset)
+            raise UploadError("Chunk checksum mismatch", 422, offset)
+        f.truncate(offset + written)
+    return offset + written
+
+
+def commit(upload_id, user_id):
+    """Verify a complete upload and move it into blob storage; returns its image filename."""
+    meta = load(upload_id, user_id)
+    part_path, meta_path = _paths(upload_id)
+    with _open_locked(part_path) as f:
+        size = os.fstat(f.fileno()).st_size
+        if size != meta["size"]:
+            raise UploadError("Upload is incomplete", 409, size)
+        digest = storage.file_digest(part_path)
+        if meta["sha256"] and digest != meta["sha256"]:
+            raise UploadError("File checksum mismatch", 422)
+        filename = storage.store_file(part_path, meta["ext"], digest)
+        os.remove(meta_path)
+    storage.register(filename)
+    return filename
+
+
+def abort(upload_id, user_id):
+    load(upload_id, user_id)
+    for path in _paths(upload_id):
+        if os.path.exists(path):
+            os.remove(path)
+
+
+def purge_stale(max_age):
+    """Remove sessions and stray temp files untouched for max_age seconds; returns how many."""
+    folder = storage.incoming_folder()
+    cutoff = time.time() - max_age
+    removed = 0
+    for name in os.listdir(folder):
+        path = os.path.join(folder, name)
+        if name.endswith('.part'):
+            continue
+        if name.endswith('.json'):
+            # A session is live as long as chunks keep arriving
+            part_path = path[:-len('.json')] + '.part'
+            paths = [path, part_path]
+            last_touched = max(os.path.getmtime(p) for p in paths if os.path.exists(p))
+        else:
+            paths = [path]
+            last_touched = os.path.getmtime(path)
+        if last_touched < cutoff:
+            for p in paths:
+                if os.path.exists(p):
+                    os.remove(p)
+            removed += 1
+    return removed
@@ -0,0 +1,103 @@
+import re
+from sqlalchemy import event, inspect, text, func, literal_column, table, column
+from models import db, Item
+
+
+# SQLite FTS5 shadow index over the searchable Item columns.
+# The rowid of each index row is the Item id.
+FTS_TABLE = 'item_fts'
+FTS_COLUMNS = ('title', 'description', 'location')
+
+# bm25() column weights, in FTS_COLUMNS order: a hit in the title counts most
+BM25_WEIGHTS = (10.0, 1.0, 5.0)
+
+item_fts = table(FTS_TABLE, column('rowid'))
+
+TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+
+
+def fts_enabled(bind):
+    return bind.dialect.name == 'sqlite'
+
+
+# The FTS table itself is created by the "add item full-text index" migration
+def rebuild_index():
+    if not fts_enabled(db.engine):
+        return 0
+    with db.engine.begin() as conn:
+        return rebuild(conn)
+
+
+def rebuild(conn):
+    conn.execute(text(f"DELETE FROM {FTS_TABLE}"))
+    result = conn.execute(text(
+        f"INSERT INTO {FTS_TABLE}(rowid, {', '.join(FTS_COLUMNS)}) "
+        f"SELECT id, {', '.join(FTS_COLUMNS)} FROM item"
+    ))
+    return result.rowcount
+
+
+def build_match_query(query_text):
+    # Quote every token so user input can't inject FTS operators; the last
+    # token is a prefix match so partially typed words still hit.
+    tokens = TOKEN_RE.findall(query_text or '')
+    if not tokens:
+        return None
+    terms = [f'"{token}"' for token in tokens]
+    terms[-1] += '*'
+    return ' '.join(terms)
+
+
+def apply_search(query, query_text):
+    """Restrict an Item query to rows matching query_text, best BM25 rank first."""
+    if not fts_enabled(db.engine):
+        pattern = f"%{query_text}%"
+        return query.filter(
+            Item.title.ilike(pattern) | Item.description.ilike(pattern) | Item.location.ilike(pattern)
+        ).order_by(Item.date_posted.desc())
+
+    match = build_match_query(query_text)
+    if match is None:
+        return query.filter(db.false())
+    fts = literal_column(FTS_TABLE)
+    return (
+        query.join(item_fts, item_fts.c.rowid == Item.id)
+        .filter(fts.op('MATCH')(match))
+        .order_by(func.bm25(fts, *BM25_WEIGHTS), Item.id.desc())
+    )
+
+
+# Keep the index in step with the item table inside the same transaction,
+# whichever route (form, API, bulk) wrote the row.
+def _index_values(target):
+    return {"id": target.id, **{name: getattr(target, name) for name in FTS_COLUMNS}}
+
+
+@event.listens_for(Item, 'after_insert')
+def _index_inserted_item(mapper, connection, target):
+    if fts_enabled(connection):
+        connection.execute(
+            text(f"INSERT INTO {FTS_TABLE}(rowid, {', '.join(FTS_COLUMNS)}) "
+                 f"VALUES (:id, {', '.join(':' + name for name in FTS_COLUMNS)})"),
+            _index_values(target)
+        )
+
+
+@event.listens_for(Item, 'after_update')
+def _index_updated_item(mapper, connection, target):
+    if not fts_enabled(connection):
+        return
+    state = inspect(target)
+    if not any(state.attrs[name].history.has_changes() for name in FTS_COLUMNS):
+        return
+    connection.execute(
+        text(f"UPDATE {FTS_TABLE} SET {', '.join(f'{name} = :{name}' for name in FTS_COLUMNS)} "
+             f"WHERE rowid = :id"),
+        _index_values(target)
+    )
+
+
+@event.listens_for(Item, 'after_delete')
+def _unindex_deleted_item(mapper, connection, target):
+    if fts_enabled(connection):
+        connection.execute(text(f"DELETE FROM {FTS_TABLE} WHERE rowid = :id"), {"id": target.id})
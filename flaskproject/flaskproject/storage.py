@@ -0,0 +1,272 @@
+import hashlib
+import logging
+import os
+import tempfile
+from datetime import datetime, timedelta
+from flask import current_app
+from sqlalchemy import event, inspect, text, update, delete
+from sqlalchemy.orm import Session, object_session
+from werkzeug.security import safe_join
+from models import db, Item, Blob
+import images
+
+logger = logging.getLogger(__name__)
+
+
+# Content-addressed upload storage. A blob is named after the SHA-256 of the
+# uploaded bytes and sharded two levels deep ("ab/cd/abcd....jpg"), so the same
+# photo uploaded twice is stored once and a name always refers to one upload.
+# Blob.refcount counts the items pointing at a file; the file and its variants
+# are removed once the last of them goes away.
+#
+# A stored blob is never replaced or rewritten, so its bytes always match its
+# name and it can be cached as immutable; the image pipeline writes the
+# EXIF-free copy it serves as a separate variant (images.full_filename).
+READ_CHUNK_SIZE = 64 * 1024
+
+# Seconds an unreferenced blob is kept after it was last uploaded, so a file a
+# concurrent upload has just claimed isn't removed under it
+GRACE_PERIOD = 3600
+
+EXTENSION_ALIASES = {'jpeg': 'jpg'}
+
+
+def normalize_extension(filename):
+    ext = filename.rsplit('.', 1)[1].lower() if '.' in filename else 'bin'
+    return EXTENSION_ALIASES.get(ext, ext)
+
+
+def blob_filename(digest, ext):
+    return f"{digest[:2]}/{digest[2:4]}/{digest}.{ext}"
+
+
+def upload_path(filename):
+    # None for absolute names and anything with ".." in it
+    return safe_join(current_app.config['UPLOAD_FOLDER'], filename)
+
+
+def is_stored(filename):
+    # Reject anything that would resolve outside the upload folder, symlinks included
+    path = upload_path(filename) if filename else None
+    if path is None:
+        return False
+    folder = os.path.realpath(current_app.config['UPLOAD_FOLDER'])
+    path = os.path.realpath(path)
+    return path.startswith(folder + os.sep) and os.path.isfile(path)
+
+
+def incoming_folder():
+    # Partial uploads live on the same filesystem so finished ones can be renamed into place
+    folder = os.path.join(current_app.config['UPLOAD_FOLDER'], '.incoming')
+    os.makedirs(folder, exist_ok=True)
+    return folder
+
+
+class BlobWriter:
+    """Streams bytes to a temporary file while hashing them, then moves it into place.
+
+        with BlobWriter() as writer:
+            for chunk in chunks:
+                writer.write(chunk)
+            filename = writer.commit('jpg')
+    """
+
+    def __init__(self):
+        fd, self.tmp_path = tempfile.mkstemp(dir=incoming_folder())
+        self._file = os.fdopen(fd, 'wb')
+        self._hash = hashlib.sha256()
+        self.size = 0
+
+    def write(self, chunk):
+        self._hash.update(chunk)
+        self._file.write(chunk)
+        self.size += len(chunk)
+
+    def hexdigest(self):
+        return self._hash.hexdigest()
+
+    def commit(self, ext):
+        self._file.close()
+        filename = blob_filename(self.hexdigest(), ext)
+        _place(self.tmp_path, filename)
+        self.tmp_path = None
+        return filename
+
+    def close(self):
+        if not self._file.closed:
+            self._file.close()
+        if self.tmp_path and os.path.exists(self.tmp_path):
+            os.remove(self.tmp_path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def save_upload(file):
+    """Store a Werkzeug FileStorage and return its blob filename."""
+    with BlobWriter() as writer:
+        while True:
+            chunk = file.stream.read(READ_CHUNK_SIZE)
+            if not chunk:
+                break
+            writer.write(chunk)
+        return writer.commit(normalize_extension(file.filename))
+
+
+def file_digest(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(READ_CHUNK_SIZE), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def store_file(path, ext, digest=None):
+    """Move a finished file on the same filesystem into storage and return its blob filename."""
+    filename = blob_filename(digest or file_digest(path), ext)
+    _place(path, filename)
+    return filename
+
+
+def _place(tmp_path, filename):
+    # Claimed before the file is looked at, so a concurrent _free leaves it alone
+    touch(filename)
+    target = upload_path(filename)
+    os.makedirs(os.path.dirname(target), exist_ok=True)
+    try:
+        # Unlike os.replace, a link never overwrites an existing copy
+        os.link(tmp_path, target)
+    except FileExistsError:
+        pass
+    os.remove(tmp_path)
+
+
+def touch(filename):
+    """Mark a blob as just uploaded, in the current transaction.
+
+    Blob.created_at is the time of the latest upload of that content; no
+    unreferenced blob is removed within GRACE_PERIOD of it.
+    """
+    now = datetime.utcnow()
+    touched = db.session.execute(update(Blob).where(Blob.filename == filename).values(created_at=now)).rowcount
+    if not touched:
+        db.session.execute(Blob.__table__.insert().values(filename=filename, refcount=0, created_at=now))
+
+
+def register(filename):
+    """Track a stored file that no item references yet, so collect_garbage() can expire it."""
+    touch(filename)
+    db.session.commit()
+
+
+def remove_files(filename):
+    # The original plus each variant the image pipeline writes, by exact name: a legacy
+    # "IMG.jpg" must not take another upload's "IMG_0001.jpg" with it
+    if not is_stored(filename):
+        return
+    for candidate in [filename] + images.variant_filenames(filename):
+        path = upload_path(candidate)
+        if path is None:
+            continue
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+
+def discard(filename):
+    """Drop a blob outright, whatever its reference count (used for rejected uploads)."""
+    Blob.query.filter_by(filename=filename).delete()
+    db.session.commit()
+    remove_files(filename)
+
+
+def collect_garbage(grace=GRACE_PERIOD):
+    """Remove every blob no item references any more. Returns how many were removed.
+
+    Blobs younger than grace seconds are kept: they may be uploads whose item
+    hasn't been created yet.
+    """
+    cutoff = datetime.utcnow() - timedelta(seconds=grace)
+    filenames = [
+        blob.filename for blob in Blob.query.filter(Blob.refcount <= 0, Blob.created_at < cutoff).all()
+    ]
+    for filename in filenames:
+        _free(filename, grace)
+    return len(filenames)
+
+
+def _free(filename, grace=GRACE_PERIOD):
+    # Only the process whose DELETE removed the row removes the files
+    cutoff = datetime.utcnow() - timedelta(seconds=grace)
+    with db.engine.begin() as conn:
+        deleted = conn.execute(
+            delete(Blob.__table__).where(
+                Blob.filename == filename, Blob.refcount <= 0, Blob.created_at < cutoff
+            )
+        ).rowcount
+    if deleted:
+        remove_files(filename)
+
+
+# Reference counting follows Item.image_filename in the same transaction as the item write.
+# Names that aren't files in the upload folder are never counted, so they can never be freed.
+def _acquire(connection, filename):
+    updated = connection.execute(
+        text("UPDATE blob SET refcount = refcount + 1 WHERE filename = :f"), {"f": filename}
+    ).rowcount
+    if not updated:
+        connection.execute(
+            Blob.__table__.insert().values(filename=filename, refcount=1)
+        )
+
+
+def _release(connection, target, filename):
+    connection.execute(text("UPDATE blob SET refcount = refcount - 1 WHERE filename = :f"), {"f": filename})
+    session = object_session(target)
+    if session is not None:
+        session.info.setdefault('released_blobs', set()).add(filename)
+
+
+@event.listens_for(Item, 'after_insert')
+def _acquire_inserted(mapper, connection, target):
+    if is_stored(target.image_filename):
+        _acquire(connection, target.image_filename)
+
+
+@event.listens_for(Item, 'after_update')
+def _swap_updated(mapper, connection, target):
+    history = inspect(target).attrs.image_filename.history
+    if not history.has_changes():
+        return
+    for old in history.deleted:
+        if is_stored(old):
+            _release(connection, target, old)
+    for new in history.added:
+        if is_stored(new):
+            _acquire(connection, new)
+
+
+@event.listens_for(Item, 'after_delete')
+def _release_deleted(mapper, connection, target):
+    if is_stored(target.image_filename):
+        _release(connection, target, target.image_filename)
+
+
+@event.listens_for(Session, 'after_commit')
+def _free_released(session):
+    released = session.info.pop('released_blobs', None)
+    for filename in released or ():
+        try:
+            _free(filename)
+        except Exception:
+            # Left for `flask collect-blobs`
+            logger.exception("Could not free blob %s", filename)
+
+
+@event.listens_for(Session, 'after_rollback')
+def _forget_released(session):
+    session.info.pop('released_blobs', None)
@@ -0,0 +1,66 @@
+from werkzeug.exceptions import RequestEntityTooLarge
+from werkzeug.sansio.multipart import MultipartDecoder, Data, Epilogue, Field, File, NeedData
+import storage
+from resumable import UploadError, READ_CHUNK_SIZE
+
+
+# One-shot uploads streamed from a multipart/form-data body straight into blob
+# storage. request.files would spool the whole file first (in memory, then in
+# a temporary file) before it could be copied; here each block read from the
+# socket is decoded and written to a BlobWriter as it arrives, so memory stays
+# at a block or two whatever the file size.
+
+# Headers and other fields are all the decoder ever needs to hold at once
+MAX_BUFFER = 1024 * 1024
+MAX_PARTS = 16
+
+
+def save_multipart(stream, boundary, field, allowed, max_size):
+    """Store the file sent as `field` in a multipart body read from stream.
+
+    allowed(filename) vetoes the client's filename. Other parts are skipped.
+    Returns the blob filename; raises UploadError if the body is malformed,
+    too large or has no such file.
+    """
+    if not boundary:
+        raise UploadError("Expected a multipart/form-data body with a boundary")
+
+    decoder = MultipartDecoder(boundary.encode('latin-1'), MAX_BUFFER, max_parts=MAX_PARTS)
+    writer = None
+    receiving = False
+    try:
+        while True:
+            try:
+                event = decoder.next_event()
+            except ValueError:
+                raise UploadError("Malformed multipart body")
+            if isinstance(event, NeedData):
+                try:
+                    decoder.receive_data(stream.read(READ_CHUNK_SIZE) or None)
+                except RequestEntityTooLarge:
+                    raise UploadError("Multipart headers are too large", 413)
+            elif isinstance(event, File) and event.name == field and writer is None:
+                if not allowed(event.filename or ''):
+                    raise UploadError("File type not allowed")
+                writer = storage.BlobWriter()
+                ext = storage.normalize_extension(event.filename)
+                receiving = True
+            elif isinstance(event, (Field, File)):
+                receiving = False
+            elif isinstance(event, Data) and receiving:
+                writer.write(event.data)
+                if writer.size > max_size:
+                    raise UploadError(f"Uploads are limited to {max_size} bytes", 413)
+                receiving = event.more_data
+            elif isinstance(event, Epilogue):
+                break
+
+        if writer is None or writer.size == 0:
+            raise UploadError(f"No file was sent in the '{field}' field")
+        filename = writer.commit(ext)
+    finally:
+        if writer is not None:
+            writer.close()
+
+    storage.register(filename)
+    return filename
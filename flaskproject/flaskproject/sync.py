@@ -0,0 +1,79 @@
+import base64
+from datetime import datetime
+from sqlalchemy import event, func, and_, or_, insert
+from models import db, Item, User, ItemTombstone
+
+
+# Sync tokens are "<changed_at iso>|<item id>|<tombstone id>" in urlsafe base64:
+# a keyset position in the item change order plus the last deletion seen.
+changed_at = Item.updated_at
+
+
+def encode_token(last_changed, last_item_id, last_tombstone_id):
+    stamp = last_changed.isoformat() if last_changed else ''
+    raw = f"{stamp}|{last_item_id}|{last_tombstone_id}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_token(token):
+    try:
+        padded = token + "=" * (-len(token) % 4)
+        stamp, item_id, tombstone_id = base64.urlsafe_b64decode(padded).decode().split("|")
+        return (datetime.fromisoformat(stamp) if stamp else None), int(item_id), int(tombstone_id)
+    except (ValueError, UnicodeDecodeError):
+        return None
+
+
+def changes_since(position, limit):
+    """Items changed and ids deleted after position (None for a full sync).
+
+    Returns (rows, deleted_ids, next_position, has_more), where rows are
+    (Item, username) pairs in change order.
+    """
+    if position is None:
+        last_changed, last_item_id = None, 0
+        # A full sync already reflects every past deletion
+        last_tombstone_id = db.session.query(func.coalesce(func.max(ItemTombstone.id), 0)).scalar()
+        tombstones = []
+    else:
+        last_changed, last_item_id, last_tombstone_id = position
+        tombstones = (
+            ItemTombstone.query
+            .filter(ItemTombstone.id > last_tombstone_id)
+            .order_by(ItemTombstone.id)
+            .limit(limit + 1)
+            .all()
+        )
+
+    query = (
+        db.session.query(Item, User.username, changed_at)
+        .outerjoin(User, Item.user_id == User.id)
+        .order_by(changed_at, Item.id)
+    )
+    if last_changed is not None:
+        query = query.filter(or_(
+            changed_at > last_changed,
+            and_(changed_at == last_changed, Item.id > last_item_id)
+        ))
+    rows = query.limit(limit + 1).all()
+
+    has_more = len(rows) > limit or len(tombstones) > limit
+    rows = rows[:limit]
+    tombstones = tombstones[:limit]
+
+    if rows:
+        last_changed, last_item_id = rows[-1][2], rows[-1][0].id
+    if tombstones:
+        last_tombstone_id = tombstones[-1].id
+
+    deleted_ids = [tombstone.item_id for tombstone in tombstones]
+    return [(item, username) for item, username, _ in rows], deleted_ids, \
+        (last_changed, last_item_id, last_tombstone_id), has_more
+
+
+# Log every Item delete in the same transaction, whichever route issued it
+@event.listens_for(Item, 'after_delete')
+def _record_tombstone(mapper, connection, target):
+    connection.execute(
+        insert(ItemTombstone.__table__).values(item_id=target.id, deleted_at=datetime.utcnow())
+    )
@@ -0,0 +1,99 @@
+import atexit
+import logging
+import threading
+from collections import defaultdict
+from sqlalchemy import text
+from models import db
+from cache import response_cache, item_key
+from etag import bump_collection
+
+logger = logging.getLogger(__name__)
+
+
+class ViewCounter:
+    """Buffers Item.views increments in memory and writes them in one batched UPDATE.
+
+    Pending hits are flushed every VIEW_FLUSH_INTERVAL seconds, as soon as
+    VIEW_FLUSH_THRESHOLD hits are buffered, and at interpreter shutdown, so
+    the stored counts lag the real ones by at most VIEW_FLUSH_INTERVAL
+    (plus CACHE_TTL for cached list pages).
+    """
+
+    def __init__(self, app=None):
+        self.app = None
+        self._pending = defaultdict(int)
+        self._hits = 0
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('VIEW_FLUSH_INTERVAL', 5.0)
+        app.config.setdefault('VIEW_FLUSH_THRESHOLD', 100)
+        self.app = app
+        atexit.register(self.shutdown)
+
+    def hit(self, item_id):
+        self._ensure_flusher()
+        with self._lock:
+            self._pending[item_id] += 1
+            self._hits += 1
+            due = self._hits >= self.app.config['VIEW_FLUSH_THRESHOLD']
+        if due:
+            self.flush()
+
+    def pending(self, item_id):
+        with self._lock:
+            return self._pending.get(item_id, 0)
+
+    def flush(self):
+        # Only one flush at a time so batches are applied in order
+        with self._flush_lock:
+            with self._lock:
+                batch = self._pending
+                self._pending = defaultdict(int)
+                self._hits = 0
+            if not batch:
+                return 0
+
+            params = [{"id": item_id, "n": count} for item_id, count in batch.items()]
+            try:
+                with self.app.app_context(), db.engine.begin() as conn:
+                    conn.execute(text("UPDATE item SET views = coalesce(views, 0) + :n WHERE id = :id"), params)
+                    # List pages show view counts too
+                    bump_collection(conn)
+            except Exception:
+                logger.exception("Failed to flush %d view counts, keeping them for the next flush", len(params))
+                with self._lock:
+                    for item_id, count in batch.items():
+                        self._pending[item_id] += count
+                        self._hits += count
+                return 0
+            # Single-item payloads pick up the new counts now; list pages within CACHE_TTL
+            response_cache.bump(*(item_key(item_id) for item_id in batch))
+            return len(params)
+
+    def shutdown(self):
+        self._stop.set()
+        if self.app is not None:
+            self.flush()
+
+    def _ensure_flusher(self):
+        # Started lazily so each forked worker gets its own flusher thread
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name='view-counter-flush', daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        interval = self.app.config['VIEW_FLUSH_INTERVAL']
+        while not self._stop.wait(interval):
+            self.flush()
+
+
+view_counter = ViewCounter()
@@ -120,6 +120,24 @@ MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 FILE_UPLOAD_MAX_MEMORY_SIZE = 10485760  # 10 MB
 
 
+# Flask API the views talk to, through the pooled client in realapp/api_client.py
+FLASK_API_BASE = os.getenv('FLASK_API_BASE', 'http://localhost:5000')
+# Connections per process at most, and how many idle ones are kept alive (and for how long)
+FLASK_API_POOL_SIZE = int(os.getenv('FLASK_API_POOL_SIZE', '20'))
+FLASK_API_KEEPALIVE = int(os.getenv('FLASK_API_KEEPALIVE', '10'))
+FLASK_API_KEEPALIVE_EXPIRY = float(os.getenv('FLASK_API_KEEPALIVE_EXPIRY', '30'))
+# Seconds to establish a connection, and to wait for each read of the response
+FLASK_API_CONNECT_TIMEOUT = float(os.getenv('FLASK_API_CONNECT_TIMEOUT', '2'))
+FLASK_API_READ_TIMEOUT = float(os.getenv('FLASK_API_READ_TIMEOUT', '10'))
+# Calls slower than this many seconds are logged
+FLASK_API_SLOW_CALL = float(os.getenv('FLASK_API_SLOW_CALL', '1'))
+# API responses cached per user (realapp/api_cache.py): served fresh for TTL seconds,
+# then served stale for up to STALE more while being revalidated in the background
+FLASK_API_CACHE_TTL = float(os.getenv('FLASK_API_CACHE_TTL', '30'))
+FLASK_API_CACHE_STALE = float(os.getenv('FLASK_API_CACHE_STALE', '300'))
+FLASK_API_CACHE_MAX_ENTRIES = int(os.getenv('FLASK_API_CACHE_MAX_ENTRIES', '1024'))
+
+
 # Static files (CSS, JavaScript, Images)
 # https://docs.djangoproject.com/en/5.1/howto/static-files/
 
@@ -0,0 +1,132 @@
+# api_cache.py in your Django app
+import logging
+import threading
+import time
+from collections import OrderedDict
+
+import httpx
+from django.conf import settings
+
+from .api_client import api
+
+logger = logging.getLogger(__name__)
+
+
+COMPLAINTS = 'complaints'
+
+
+class ApiCache:
+    """Per-process cache of Flask API JSON responses, per user, with stale-while-revalidate.
+
+    An entry is served as is for FLASK_API_CACHE_TTL seconds. For the next
+    FLASK_API_CACHE_STALE seconds it is still served straight away, while a
+    single background task revalidates it with If-None-Match, so a 304 from
+    Flask costs no rebuild. Older entries are fetched inline.
+
+    Like the Flask ResponseCache, every entry belongs to a collection and is
+    stored under the collection's current version: bump() after a write in
+    this process hides its entries at once. Writes made through other Django
+    processes show up after the TTL.
+    """
+
+    def __init__(self):
+        self._entries = OrderedDict()
+        self._versions = {}
+        self._refreshing = set()
+        self._tasks = set()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.revalidated = 0
+        self.evictions = 0
+
+    def bump(self, *collections):
+        with self._lock:
+            for collection in collections:
+                self._versions[collection] = self._versions.get(collection, 0) + 1
+
+    async def get_json(self, collection, user, path, token=None, params=None):
+        """The JSON body of GET path for user. Errors raise httpx.HTTPError and aren't cached."""
+        now = time.monotonic()
+        ttl = settings.FLASK_API_CACHE_TTL
+        with self._lock:
+            key = (collection, self._versions.get(collection, 0), user, path, tuple(sorted((params or {}).items())))
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                age = now - entry[2]
+                if age < ttl:
+                    self.hits += 1
+                    return entry[0]
+                if age < ttl + settings.FLASK_API_CACHE_STALE:
+                    self.stale_hits += 1
+                    refresh = key not in self._refreshing
+                    self._refreshing.add(key)
+                else:
+                    entry = None
+            if entry is None:
+                self.misses += 1
+
+        if entry is None:
+            return await self._fetch(key, path, token, params)
+        if refresh:
+            # On the API client's loop: the request's own loop may be closed as soon as it returns
+            future = api.submit(self._refresh(key, path, token, params, entry))
+            self._tasks.add(future)
+            future.add_done_callback(self._tasks.discard)
+        return entry[0]
+
+    async def _refresh(self, key, path, token, params, entry):
+        try:
+            await self._fetch(key, path, token, params, entry)
+        except httpx.HTTPError as exc:
+            # Keep serving the stale copy; the next request past the TTL tries again
+            logger.warning("Could not revalidate %s: %s", path, exc)
+        finally:
+            with self._lock:
+                self._refreshing.discard(key)
+
+    async def _fetch(self, key, path, token, params, entry=None):
+        headers = {"If-None-Match": entry[1]} if entry is not None and entry[1] else None
+        response = await api.get(path, token=token, params=params, headers=headers)
+        if response.status_code == 304 and entry is not None:
+            data, etag = entry[0], response.headers.get("ETag", entry[1])
+            self.revalidated += 1
+        else:
+            response.raise_for_status()
+            data, etag = response.json(), response.headers.get("ETag")
+
+        with self._lock:
+            # An entry fetched across a bump() lands under the old version, where nobody looks
+            self._entries[key] = (data, etag, time.monotonic())
+            self._entries.move_to_end(key)
+            self._refreshing.discard(key)
+            while len(self._entries) > settings.FLASK_API_CACHE_MAX_ENTRIES:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+        return data
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.stale_hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": settings.FLASK_API_CACHE_MAX_ENTRIES,
+                "ttl": settings.FLASK_API_CACHE_TTL,
+                "stale": settings.FLASK_API_CACHE_STALE,
+                "hits": self.hits,
+                "stale_hits": self.stale_hits,
+                "misses": self.misses,
+                "revalidated": self.revalidated,
+                "evictions": self.evictions,
+                "hit_rate": (self.hits + self.stale_hits) / lookups if lookups else 0.0,
+                "versions": dict(self._versions),
+            }
+
+
+api_cache = ApiCache()
@@ -0,0 +1,210 @@
+# api_client.py in your Django app
+import asyncio
+import logging
+import os
+import re
+import secrets
+import threading
+import time
+from collections import deque
+
+import httpx
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+
+# Every call from the views to the Flask API goes through one pooled client per
+# process, so connections are kept alive and reused instead of opened per call,
+# and a slow or unreachable API fails within FLASK_API_CONNECT_TIMEOUT /
+# FLASK_API_READ_TIMEOUT rather than holding the worker indefinitely.
+#
+# The client lives on its own event loop thread. Under WSGI (runserver,
+# lostAndFound/wsgi.py) asgiref runs each async view on a fresh loop that is
+# closed when the view returns, which would take any pool, and any background
+# work, down with it; the views only await results from the client's loop.
+ID_SEGMENT_RE = re.compile(r'/\d+(?=/|$)')
+
+# Latencies kept per endpoint for the percentiles
+SAMPLE_SIZE = 256
+
+# Bytes read from an uploaded file per chunk of a streamed request body
+UPLOAD_CHUNK_SIZE = 64 * 1024
+
+
+def endpoint_name(method, path):
+    # "/complaint/42" and "/complaint/7" are the same endpoint
+    return f"{method.upper()} {ID_SEGMENT_RE.sub('/<id>', path)}"
+
+
+class ApiMetrics:
+    """Call count, failures and latency per endpoint, since the process started."""
+
+    def __init__(self):
+        self._endpoints = {}
+        self._lock = threading.Lock()
+
+    def record(self, endpoint, elapsed, failed):
+        with self._lock:
+            entry = self._endpoints.get(endpoint)
+            if entry is None:
+                entry = self._endpoints[endpoint] = {
+                    "calls": 0, "errors": 0, "total": 0.0, "max": 0.0, "samples": deque(maxlen=SAMPLE_SIZE)
+                }
+            entry["calls"] += 1
+            entry["errors"] += failed
+            entry["total"] += elapsed
+            entry["max"] = max(entry["max"], elapsed)
+            entry["samples"].append(elapsed)
+
+    def snapshot(self):
+        with self._lock:
+            endpoints = {name: dict(entry, samples=sorted(entry["samples"])) for name, entry in self._endpoints.items()}
+        stats = {}
+        for name, entry in sorted(endpoints.items()):
+            samples = entry["samples"]
+            stats[name] = {
+                "calls": entry["calls"],
+                "errors": entry["errors"],
+                "avg_ms": round(entry["total"] / entry["calls"] * 1000, 1),
+                "p50_ms": round(samples[len(samples) // 2] * 1000, 1),
+                "p95_ms": round(samples[min(len(samples) - 1, int(len(samples) * 0.95))] * 1000, 1),
+                "max_ms": round(entry["max"] * 1000, 1),
+            }
+        return stats
+
+    def reset(self):
+        with self._lock:
+            self._endpoints.clear()
+
+
+def client_options():
+    """httpx.AsyncClient keyword arguments built from the FLASK_API_* settings."""
+    return {
+        "base_url": settings.FLASK_API_BASE,
+        "limits": httpx.Limits(
+            max_connections=settings.FLASK_API_POOL_SIZE,
+            max_keepalive_connections=settings.FLASK_API_KEEPALIVE,
+            keepalive_expiry=settings.FLASK_API_KEEPALIVE_EXPIRY,
+        ),
+        "timeout": httpx.Timeout(settings.FLASK_API_READ_TIMEOUT, connect=settings.FLASK_API_CONNECT_TIMEOUT),
+    }
+
+
+def auth_headers(token, headers=None):
+    headers = dict(headers or {})
+    if token:
+        headers["Authorization"] = f"Bearer {token}"
+    return headers
+
+
+def multipart_file(field, uploaded_file, filename):
+    """Headers and an async body streaming a Django UploadedFile as multipart/form-data.
+
+    The body is produced chunk by chunk from the upload as it is sent, never
+    assembled in memory. Its exact length is known up front, so it goes out
+    with a Content-Length rather than chunked (which the WSGI side can't read).
+    """
+    boundary = secrets.token_hex(16)
+    content_type = (uploaded_file.content_type or "application/octet-stream").replace('"', "")
+    head = (
+        f"--{boundary}\r\n"
+        f'Content-Disposition: form-data; name="{field}"; filename="{filename}"\r\n'
+        f"Content-Type: {content_type}\r\n\r\n"
+    ).encode()
+    tail = f"\r\n--{boundary}--\r\n".encode()
+
+    async def body():
+        yield head
+        # Reads from Django's in-memory or spooled upload, a short local read per chunk
+        for chunk in uploaded_file.chunks(UPLOAD_CHUNK_SIZE):
+            yield chunk
+        yield tail
+
+    headers = {
+        "Content-Type": f"multipart/form-data; boundary={boundary}",
+        "Content-Length": str(len(head) + uploaded_file.size + len(tail)),
+    }
+    return headers, body()
+
+
+def _record(metrics, endpoint, started, failed):
+    elapsed = time.perf_counter() - started
+    metrics.record(endpoint, elapsed, failed)
+    if elapsed > settings.FLASK_API_SLOW_CALL:
+        logger.warning("Slow Flask API call %s took %.0f ms", endpoint, elapsed * 1000)
+
+
+class ApiClient:
+    """Pooled, keep-alive async HTTP client for the Flask API.
+
+        complaint, matches = await asyncio.gather(
+            api.get("/complaint/42", token=token),
+            api.get("/complaint/42/matches", token=token),
+        )
+
+    Requests run on the client's own loop thread, so they can be awaited from
+    any event loop, and submit() schedules work that must outlive the request.
+    Transport failures and timeouts raise httpx.HTTPError; HTTP error
+    statuses are returned as responses, like requests did.
+    """
+
+    def __init__(self, metrics=None):
+        self.metrics = metrics or ApiMetrics()
+        self._loop = None
+        self._client = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    async def request(self, method, path, **kwargs):
+        return await asyncio.wrap_future(self.submit(self._request(method, path, **kwargs)))
+
+    async def get(self, path, **kwargs):
+        return await self.request("GET", path, **kwargs)
+
+    async def post(self, path, **kwargs):
+        return await self.request("POST", path, **kwargs)
+
+    async def put(self, path, **kwargs):
+        return await self.request("PUT", path, **kwargs)
+
+    async def delete(self, path, **kwargs):
+        return await self.request("DELETE", path, **kwargs)
+
+    def submit(self, coroutine):
+        """Run coroutine on the client's loop; returns a concurrent.futures.Future."""
+        return asyncio.run_coroutine_threadsafe(coroutine, self._ensure_loop())
+
+    def close(self):
+        with self._lock:
+            if self._loop is None or self._pid != os.getpid():
+                return
+            loop, client = self._loop, self._client
+            self._loop = self._client = None
+        asyncio.run_coroutine_threadsafe(client.aclose(), loop).result()
+        loop.call_soon_threadsafe(loop.stop)
+
+    async def _request(self, method, path, token=None, headers=None, **kwargs):
+        endpoint = endpoint_name(method, path)
+        started = time.perf_counter()
+        failed = True
+        try:
+            response = await self._client.request(method, path, headers=auth_headers(token, headers), **kwargs)
+            failed = response.status_code >= 500
+            return response
+        finally:
+            _record(self.metrics, endpoint, started, failed)
+
+    def _ensure_loop(self):
+        # Started lazily, and again in a forked worker, which doesn't inherit the thread
+        with self._lock:
+            if self._loop is None or self._pid != os.getpid():
+                loop = asyncio.new_event_loop()
+                threading.Thread(target=loop.run_forever, name='flask-api-client', daemon=True).start()
+                # The client's connections bind to the loop it is first used on: this one
+                self._client = httpx.AsyncClient(**client_options())
+                self._loop, self._pid = loop, os.getpid()
+            return self._loop
+
+
+api = ApiClient()
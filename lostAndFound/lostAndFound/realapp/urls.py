@@ -13,6 +13,7 @@ urlpatterns = [
     path('delete-complaint/<int:complaint_id>/', views.delete_complaint_view, name='delete_complaint'),
     path('complaints/<int:complaint_id>/update/', views.update_complaint_view, name='update_complaint'),
     path('complaint/<int:complaint_id>/', views.view_complaint_view, name='view_complaint'),
+    path('api-metrics/', views.api_metrics_view, name='api_metrics'),
 
 ]
 if settings.DEBUG:
@@ -1,15 +1,16 @@
 # views.py in your Django app
-import requests
-import os
+import asyncio
+import httpx
+from asgiref.sync import sync_to_async
 from django.shortcuts import render, redirect , get_object_or_404
-from django.contrib.auth import login as django_login
+from django.contrib.auth import alogin as django_login, SESSION_KEY
 from django.contrib.auth.models import User
-from django.conf import settings
-from django.http import HttpResponse
+from django.http import HttpResponse, JsonResponse
 from django.contrib import messages
 from werkzeug.utils import secure_filename
 
-from django.conf import settings
+from .api_client import api, multipart_file
+from .api_cache import api_cache, COMPLAINTS
 
 
 ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif', 'pdf', 'docx'}
@@ -18,28 +19,39 @@ ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif', 'pdf', 'docx'}
 def allowed_file(filename):
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
-FLASK_API_BASE = "http://localhost:5000"  # Update with your actual Flask API base URL
 
-def login_view(request):
+# The views are async so a Flask round trip doesn't hold a worker thread (serve
+# lostAndFound/asgi.py). Templates read request.user through base.html, a lazy
+# database lookup that must not run on the event loop, so rendering happens in
+# a thread.
+async def arender(request, template_name, context=None):
+    return await sync_to_async(render)(request, template_name, context)
+
+
+async def login_view(request):
     if request.method == "POST":
         username = request.POST.get("username")
         password = request.POST.get("password")
 
         # Send request to Flask API for login
-        response = requests.post(f"{FLASK_API_BASE}/api/login", json={"username": username, "password": password})
-        
+        try:
+            response = await api.post("/api/login", json={"username": username, "password": password})
+        except httpx.HTTPError:
+            messages.error(request, "Could not connect to the login service.")
+            return redirect("login")
+
         if response.status_code == 200:
             data = response.json()
             access_token = data["access_token"]
             role = data["role"]
 
             # Optionally, save the token in session or cookies for frontend use
-            request.session['access_token'] = access_token
-            request.session['role'] = role
+            await request.session.aset('access_token', access_token)
+            await request.session.aset('role', role)
 
             # Create or update Django user if necessary
-            user, created = User.objects.get_or_create(username=username)
-            django_login(request, user)
+            user, created = await User.objects.aget_or_create(username=username)
+            await django_login(request, user)
 
             messages.success(request, "Login successful!")
             return redirect("home")  # Redirect to home or dashboard
@@ -47,21 +59,25 @@ def login_view(request):
             messages.error(request, "Invalid username or password.")
             return redirect("login")  # Stay on the login page
 
-    return render(request, "login.html")
+    return await arender(request, "login.html")
 
 
-def register_view(request):
+async def register_view(request):
     if request.method == "POST":
         username = request.POST.get("username")
         email = request.POST.get("email")
         password = request.POST.get("password")
 
         # Send request to Flask API for registration
-        response = requests.post(f"{FLASK_API_BASE}/api/register", json={
-            "username": username,
-            "email": email,
-            "password": password
-        })
+        try:
+            response = await api.post("/api/register", json={
+                "username": username,
+                "email": email,
+                "password": password
+            })
+        except httpx.HTTPError:
+            messages.error(request, "Could not connect to the registration service.")
+            return redirect("register")
 
         if response.status_code == 201:
             messages.success(request, "User registered successfully!")
@@ -73,65 +89,84 @@ def register_view(request):
             messages.error(request, "Something went wrong. Please try again.")
             return redirect("register")  # Stay on the register page if there's an unknown error
 
-    return render(request, "register.html")
+    return await arender(request, "register.html")
 
 
-def all_complaints_view(request):
-    access_token = request.session.get('access_token')
+async def all_complaints_view(request):
+    access_token = await request.session.aget('access_token')
     
     if not access_token:
         messages.error(request, "You need to be logged in to view complaints.")
         return redirect('login')  # Redirect to login page if not logged in
 
+    # The Flask API pages with a cursor; pass ?after= through to fetch older complaints
+    params = {}
+    if request.GET.get("after"):
+        params["after"] = request.GET["after"]
+
+    next_cursor = None
     try:
-        headers = {"Authorization": f"Bearer {access_token}"}
-        response = requests.get(f"{FLASK_API_BASE}/all-complaints", headers=headers)  # Flask endpoint
-        response.raise_for_status()
-        complaints = response.json()
-    except requests.exceptions.RequestException as e:
+        # Served from the per-user cache, revalidated against the Flask endpoint's ETag
+        user_id = await request.session.aget(SESSION_KEY)
+        data = await api_cache.get_json(COMPLAINTS, user_id, "/all-complaints", token=access_token, params=params)
+        complaints = data["items"]
+        next_cursor = data.get("next_cursor")
+    except httpx.HTTPError as e:
         complaints = []
         messages.error(request, f"Error fetching complaints: {e}")
 
-    return render(request, "complaints.html", {"complaints": complaints})
+    return await arender(request, "complaints.html", {"complaints": complaints, "next_cursor": next_cursor})
+
 
 
 
 
 
 
+async def upload_image(request, uploaded_file, access_token):
+    # Streamed straight into Flask's storage; returns its image_filename, or None after flashing why not
+    headers, body = multipart_file("image", uploaded_file, secure_filename(uploaded_file.name))
+    try:
+        response = await api.post("/uploads/stream", content=body, headers=headers, token=access_token)
+    except httpx.HTTPError:
+        messages.error(request, "Could not connect to the upload service.")
+        return None
+
+    if response.status_code != 201:
+        try:
+            reason = response.json().get("message")
+        except ValueError:
+            reason = None
+        messages.error(request, f"Error uploading image: {reason}" if reason else "Error uploading image.")
+        return None
+    return response.json()["image_filename"]
+
 
 # Add Complaint
-def add_complaint_view(request):
+async def add_complaint_view(request):
     if request.method == "POST":
         # Check if the file exists in the request
         complaint_file = request.FILES.get('complaint_file')
         
         # Check if user is logged in
-        access_token = request.session.get('access_token')
+        access_token = await request.session.aget('access_token')
         if not access_token:
             messages.error(request, "You need to be logged in to add a complaint.")
             return redirect("login")  # Redirect to login page if not logged in
 
         # Get other form data
-        title = request.form.get("title")
-        description = request.form.get("description")
-        category = request.form.get("category")
-        location = request.form.get("location")
+        title = request.POST.get("title")
+        description = request.POST.get("description")
+        category = request.POST.get("category")
+        location = request.POST.get("location")
 
         
         # Handle the file upload if a file is provided
         image_filename = ""
         if complaint_file and allowed_file(complaint_file.name):
-            image_filename = secure_filename(complaint_file.name)
-            # Ensure the 'uploads' directory exists
-            upload_path = os.path.join(settings.MEDIA_ROOT, 'uploads')
-            if not os.path.exists(upload_path):
-                os.makedirs(upload_path)
-
-            file_path = os.path.join(upload_path, image_filename)
-            with open(file_path, 'wb') as f:
-                for chunk in complaint_file.chunks():
-                    f.write(chunk)
+            image_filename = await upload_image(request, complaint_file, access_token)
+            if image_filename is None:
+                return redirect("add_complaint")
 
         # Prepare the data for the API request
         data = {
@@ -143,31 +178,39 @@ def add_complaint_view(request):
         }
 
         # Send the request to the Flask API to add the complaint
-        headers = {"Authorization": f"Bearer {access_token}"}
-        response = requests.post(f"{FLASK_API_BASE}/add-complaint", json=data, headers=headers)
+        try:
+            response = await api.post("/add-complaint", json=data, token=access_token)
+        except httpx.HTTPError:
+            messages.error(request, "Could not connect to the complaint service.")
+            return redirect("add_complaint")
 
         if response.status_code == 201:
+            api_cache.bump(COMPLAINTS)
             messages.success(request, "Complaint added successfully!")
             return redirect("home")  # Redirect to all complaints view
         else:
             messages.error(request, "Error adding complaint.")
             return redirect("add_complaint")  # Stay on the add complaint page
 
-    return render(request, "add_complaint.html")
+    return await arender(request, "add_complaint.html")
 
 
 # Delete Complaint
-def delete_complaint_view(request, complaint_id):
-    access_token = request.session.get('access_token')
+async def delete_complaint_view(request, complaint_id):
+    access_token = await request.session.aget('access_token')
     if not access_token:
         messages.error(request, "You need to be logged in to delete a complaint.")
         return redirect("login")  # Redirect to login page if not logged in
 
     # Send the request to the Flask API to delete the complaint
-    headers = {"Authorization": f"Bearer {access_token}"}
-    response = requests.delete(f"{FLASK_API_BASE}/delete-complaint/{complaint_id}", headers=headers)
+    try:
+        response = await api.delete(f"/delete-complaint/{complaint_id}", token=access_token)
+    except httpx.HTTPError:
+        messages.error(request, "Could not connect to the complaint service.")
+        return redirect("home")
 
     if response.status_code == 200:
+        api_cache.bump(COMPLAINTS)
         messages.success(request, "Complaint deleted successfully!")
     else:
         messages.error(request, "Error deleting complaint.")
@@ -175,50 +218,80 @@ def delete_complaint_view(request, complaint_id):
     return redirect("home")  # Redirect to all complaints view
 
 
-def update_complaint_view(request, complaint_id):  # ✅ Correct argument name
-    api_url = f"http://127.0.0.1:5000/api/complaints/{complaint_id}"  # Flask API route
-
-    if request.method == "GET":
-        response = requests.get(api_url)
-        if response.status_code == 200:
-            complaint = response.json()
-            return render(request, "update_complaint.html", {"complaint": complaint})
-        else:
-            return HttpResponse("Complaint not found", status=404)
+async def update_complaint_view(request, complaint_id):
+    access_token = await request.session.aget('access_token')
+    if not access_token:
+        messages.error(request, "You need to be logged in to update a complaint.")
+        return redirect("login")
 
-    elif request.method == "POST":
+    if request.method == "POST":
         payload = {
             "title": request.POST.get("title"),
             "description": request.POST.get("description"),
             "category": request.POST.get("category"),
             "location": request.POST.get("location"),
             "status": request.POST.get("status"),
-            "image_filename": request.POST.get("image_filename")
         }
+        # A new image is uploaded first and then referenced by its image_filename
+        image = request.FILES.get("image_filename")
+        if image and allowed_file(image.name):
+            payload["image_filename"] = await upload_image(request, image, access_token)
+            if payload["image_filename"] is None:
+                return redirect("update_complaint", complaint_id=complaint_id)
+
+        try:
+            response = await api.put(f"/complaints/{complaint_id}/update", data=payload, token=access_token)
+        except httpx.HTTPError:
+            messages.error(request, "Could not connect to the complaint service.")
+            return redirect("update_complaint", complaint_id=complaint_id)
 
-        token = request.session.get("jwt_token")  # assumes token is stored in session
-        headers = {"Authorization": f"Bearer {token}"} if token else {}
-
-        response = requests.put(api_url, json=payload, headers=headers)
         if response.status_code == 200:
-            return redirect("complaint_list")  # make sure this name matches your URL name
+            api_cache.bump(COMPLAINTS)
+            messages.success(request, "Complaint updated successfully!")
+            return redirect("view_complaint", complaint_id=complaint_id)
+        elif response.status_code == 403:
+            messages.error(request, "You can only update your own complaints.")
         else:
-            return HttpResponse("Update failed", status=response.status_code)
+            messages.error(request, "Error updating complaint.")
+        return redirect("update_complaint", complaint_id=complaint_id)
+
+    try:
+        response = await api.get(f"/complaint/{complaint_id}", token=access_token)
+    except httpx.HTTPError:
+        messages.error(request, "Could not connect to the complaint service.")
+        return redirect("home")
+
+    if response.status_code == 200:
+        return await arender(request, "update_complaint.html", {"complaint": response.json()})
+    return HttpResponse("Complaint not found", status=404)
+
+
+def related_items(response, key):
+    # Matches and similar photos are extras: the page renders without them
+    if isinstance(response, httpx.Response) and response.status_code == 200:
+        return response.json().get(key, [])
+    return []
 
 
-def view_complaint_view(request, complaint_id):
-    access_token = request.session.get('access_token')
+async def view_complaint_view(request, complaint_id):
+    access_token = await request.session.aget('access_token')
     
     if not access_token:
         messages.error(request, "You need to be logged in to view complaint details.")
         return redirect("login")
 
-    headers = {"Authorization": f"Bearer {access_token}"}
-    try:
-        response = requests.get(f"{FLASK_API_BASE}/complaint/{complaint_id}", headers=headers)
-    except requests.exceptions.RequestException:
+    # The complaint, its lost/found matches and its look-alike photos are fetched concurrently
+    response, matches, similar = await asyncio.gather(
+        api.get(f"/complaint/{complaint_id}", token=access_token),
+        api.get(f"/complaint/{complaint_id}/matches", token=access_token),
+        api.get(f"/complaint/{complaint_id}/similar-images", token=access_token, params={"limit": 6}),
+        return_exceptions=True,
+    )
+    if isinstance(response, httpx.HTTPError):
         messages.error(request, "Could not connect to the complaint service.")
         return redirect("home")
+    if isinstance(response, BaseException):
+        raise response
 
     if response.status_code == 200:
         data = response.json()
@@ -232,12 +305,25 @@ def view_complaint_view(request, complaint_id):
             "username": data.get("username"),
             "date_posted": data.get("date_posted"),
             "image_filename": data.get("image_filename"),
+            "image_variants": data.get("image_variants"),
             "views": data.get("views"),
         }
-        return render(request, "view_complaint.html", {"complaint": complaint})
+        return await arender(request, "view_complaint.html", {
+            "complaint": complaint,
+            "matches": related_items(matches, "matches"),
+            "similar": related_items(similar, "similar"),
+        })
     elif response.status_code == 404:
         messages.error(request, "Complaint not found.")
     else:
         messages.error(request, "Failed to retrieve complaint details.")
 
     return redirect("home")
+
+
+async def api_metrics_view(request):
+    # Per-endpoint latency of the calls this process made to the Flask API, and how the cache spared it
+    user = await request.auser()
+    if not user.is_staff:
+        return HttpResponse(status=403)
+    return JsonResponse({"endpoints": api.metrics.snapshot(), "cache": api_cache.stats()})